@@ -1,10 +1,17 @@
 #!/usr/bin/env python
 import click
 import multiprocessing
+from typing import Optional
 from whaaaaat import prompt
 
 from modules.purger.purger import Purger
+from modules.purger.reprocessor import Reprocessor
 from modules.postprocessor.postprocessor import Postprocessor
+from modules.benchmark.benchmark import Benchmark, save_results, compare_results
+from modules.preflight.preflight import Preflight, save_report
+from modules.recompressor.recompressor import Recompressor
+from modules.utils import logger as log
+from modules.utils import mongo
 
 
 def select_languages(available_langs: list[str], current_langs: list[str]) -> list[str]:
@@ -24,8 +31,16 @@ def select_languages(available_langs: list[str], current_langs: list[str]) -> li
 
 
 @click.group(help="Tool to purge your raw fbl datasets and to postprocess them")
-def cli():
-    pass
+@click.option('--log-level', type=click.Choice(['debug', 'info', 'succ', 'warn', 'error'], case_sensitive=False), default='info', show_default=True, help='Minimum level of the printed log records, also in the parallel processes')
+@click.option('--log-format', type=click.Choice(['text', 'json']), default='text', show_default=True, help='If the log records are printed as coloured text or as json lines')
+@click.option('--log-rate', type=click.INT, default=10, show_default=True, help='Warnings of the same language, asset and source line printed each minute, the others are counted and summarized. If 0, all the warnings are printed')
+@click.option('--mongo-uri', type=click.STRING, default='mongodb://localhost:27017', show_default=True, help='URI of MongoDB, the connection is opened once by each process and shared by all its assets and languages')
+@click.option('--pool-size', type=click.INT, default=100, show_default=True, help='Maximum number of connections to MongoDB of each process')
+@click.option('--compressors', type=click.STRING, default='', help='Comma separated compressors of the messages exchanged with MongoDB, among snappy, zlib and zstd. Default is no compression')
+@click.option('--write-concern', type=click.Choice(['fast', 'default', 'safe']), default='default', show_default=True, help='Write concern of the inserts: fast is acknowledged before being journaled, default is the one of the server, safe waits for the majority and the journal')
+def cli(*, log_level: str, log_format: str, log_rate: int, mongo_uri: str, pool_size: int, compressors: str, write_concern: str):
+    log.configure(log_level, log_format, log_rate)
+    mongo.configure(mongo_uri, pool_size, compressors, write_concern)
 
 
 @cli.command(help='Purges raw fbl datasets uploading them on MongoDB')
@@ -42,14 +57,46 @@ def cli():
 @click.option('-o', '--octopus/--no-octopus', is_flag=True, show_default=True, help='If parallel is set, purge even the assets of a same language in parallel')
 @click.option('-n', '--nazi/--no-nazi', is_flag=True, show_default=True, help='If it will fail as soon as an invalid line or error is encountered')
 @click.option('--skip-first-line/--no-skip-first-line', is_flag=True, show_default=True, help='If a language has more han an asset, it could happen that a line is split between two assets. If this flag is enabled, the first line of all but the first assets is skipped.')
-@click.option('-w', '--wide/--no-wide', is_flag=True, show_default=True, help='If also txt files and not only bz2 files will be considered')
+@click.option('-w', '--wide/--no-wide', is_flag=True, show_default=True, help='If also txt files and not only compressed files (bz2, gz, xz, zst) will be considered')
 @click.option('-j', '--jump-lines', type=click.INT, default=0, show_default=True, help='How many initial lines of each file will be skipped')
-def purge(*, src: str, langs: list[str], dbname: str, threshold: int, bias: int, parallel: bool, processes: int, choose_langs: bool, force: bool, skip: bool, octopus: bool, nazi: bool, skip_first_line: bool, wide: bool, jump_lines: int):
+@click.option('--linear/--no-linear', is_flag=True, show_default=True, help='If lines will be matched with backtracking-free regexes in linear time, without the per-line timeout. Schemas that cannot be matched in linear time keep the timeout')
+@click.option('--block-processes', type=click.INT, default=0, show_default=True, help='If greater than 1, the blocks of each bz2 asset are decompressed in parallel by this number of processes')
+@click.option('--shards', type=click.INT, default=0, show_default=True, help='If greater than 1 and wide is set, each txt asset is memory mapped, split into this number of byte ranges and the ranges are purged in parallel, keeping the same line field of a serial purge')
+@click.option('--writers', type=click.INT, default=0, show_default=True, help='If greater than 0, the buffered profiles are inserted on the database by this number of background threads while the parsing goes on')
+@click.option('--batch-bytes', type=click.INT, default=0, show_default=True, help='If greater than 0, the buffered profiles are flushed on the database also when their BSON size reaches this number of bytes')
+@click.option('-u', '--unordered/--no-unordered', is_flag=True, show_default=True, help='If the profiles will be inserted without order, counting the duplicated ones instead of failing')
+@click.option('--raw-bson/--no-raw-bson', is_flag=True, show_default=True, help='If the profiles will be encoded to BSON as soon as they are parsed, buffering only their bytes')
+@click.option('-r', '--resume/--no-resume', is_flag=True, show_default=True, help='If each asset will continue from its last checkpoint instead of starting over. Assets already purged are skipped and replayed profiles are counted as duplicates')
+@click.option('--checkpoints', type=click.STRING, default='.checkpoints', show_default=True, help='Folder where the last committed line of each asset is saved, with the duration of its last purge used to purge the slowest assets first')
+@click.option('--bulk-load/--no-bulk-load', is_flag=True, show_default=True, help='If the profiles will be inserted in a collection without indexes, building the unique line index only at the end of each language and reporting the duplicated lines')
+@click.option('--sink', type=click.Choice(['mongo', 'bson', 'ndjson', 'parquet']), default='mongo', show_default=True, help='Where the profiles are written: on MongoDB, or for each asset on a BSON dump restorable with mongorestore, on a gzipped extended json file importable with mongoimport or on a parquet file with a column for each prop of the schema (requires pyarrow)')
+@click.option('--out-dir', type=click.STRING, default='dump', show_default=True, help='If the sink is a file, the folder where the files are written, as <out-dir>/<dbname>/<language>/<asset>')
+@click.option('--quarantine', type=click.STRING, default=None, help='If given, the folder where the lines that cannot be parsed are saved, with their asset and line, to be reprocessed with reprocess-quarantine')
+@click.option('--metrics-dir', type=click.STRING, default=None, help='If given, the folder where the lines read, parsed, failed and uploaded, the bytes read and the seconds spent in each stage are written, summed over all the processes, as metrics.json and as the Prometheus textfile metrics.prom')
+@click.option('--metrics-interval', type=click.FloatRange(min=0, min_open=True), default=10, show_default=True, help='If metrics dir is given, the seconds between two writes of the metrics')
+@click.option('-i', '--incremental/--no-incremental', is_flag=True, show_default=True, help='If only the new and changed assets will be purged, according to the catalog. The profiles of a changed asset are replaced and the ones of a removed asset deleted')
+@click.option('--catalog', type=click.STRING, default='.catalog', show_default=True, help='Folder where size, modification time, hash, lines and line range of each purged asset are saved')
+@click.option('--binary/--no-binary', is_flag=True, show_default=True, help='If the lines are read and matched as bytes and only the values of the kept props are decoded. The profiles are the same')
+def purge(*, src: str, langs: list[str], dbname: str, threshold: int, bias: int, parallel: bool, processes: int, choose_langs: bool, force: bool, skip: bool, octopus: bool, nazi: bool, skip_first_line: bool, wide: bool, jump_lines: int, linear: bool, block_processes: int, shards: int, writers: int, batch_bytes: int, unordered: bool, raw_bson: bool, resume: bool, checkpoints: str, bulk_load: bool, sink: str, out_dir: str, quarantine: Optional[str], metrics_dir: Optional[str], metrics_interval: float, incremental: bool, catalog: str, binary: bool):
     purger = Purger(src)
     if choose_langs:
         available_langs = purger.available_langs
         langs = select_languages(available_langs, langs)
-    purger.purge(langs, dbname, threshold, bias, parallel, processes, force, skip, octopus, nazi, skip_first_line, wide, jump_lines)
+    purger.purge(langs, dbname, threshold, bias, parallel, processes, force, skip, octopus, nazi, skip_first_line, wide, jump_lines, linear, block_processes, shards, writers, batch_bytes, unordered, raw_bson, resume, checkpoints, bulk_load, sink, out_dir, quarantine, metrics_dir, metrics_interval, incremental, catalog, binary)
+
+
+@cli.command(name='reprocess-quarantine', help='Parses again the lines saved in quarantine by purge, uploading the ones that now succeed')
+@click.option('-s', '--src', type=click.STRING, default='quarantine', show_default=True, help='Folder containing the quarantined lines')
+@click.option('-l', '--langs', type=click.STRING, multiple=True, default=['all'], show_default=True, help='Languages to reprocess. If "all" is passed, all the languages are selected')
+@click.option('-d', '--dbname', type=click.STRING, default='fbl', show_default=True, help='The name of the MongoDB database')
+@click.option('-t', '--threshold', type=click.INT, default=int(1e6), show_default=True, help='Threshold of how many profiles will be buffered before being flushed on the database')
+@click.option('-p', '--parallel/--no-parallel', is_flag=True, show_default=True, help='If the quarantined assets will be reprocessed in parallel')
+@click.option('--processes', type=click.INT, default=multiprocessing.cpu_count(), show_default=True, help='If parallel is active, specifies the number of parallel processes. Default is the number of cores of the CPU')
+@click.option('-n', '--nazi/--no-nazi', is_flag=True, show_default=True, help='If it will fail as soon as an invalid line or error is encountered')
+@click.option('--linear/--no-linear', is_flag=True, show_default=True, help='If lines will be matched with backtracking-free regexes in linear time, without the per-line timeout')
+def reprocess_quarantine(*, src: str, langs: list[str], dbname: str, threshold: int, parallel: bool, processes: int, nazi: bool, linear: bool):
+    reprocessor = Reprocessor(src)
+    reprocessor.reprocess(langs, dbname, threshold, parallel, processes, nazi, linear)
 
 
 @cli.command(help='Postprocesses a raw collection into a parsed collection')
@@ -62,12 +109,80 @@ def purge(*, src: str, langs: list[str], dbname: str, threshold: int, bias: int,
 @click.option('-f', '--force/--no-force', is_flag=True, show_default=True, help='If already parsed collections will be overriden. Overrides skip behaviour')
 @click.option('--skip/--no-skip', is_flag=True, show_default=True, help='If when encountering an already parsed collection it will be skipped')
 @click.option('-n', '--nazi/--no-nazi', is_flag=True, show_default=True, help='If it will fail as soon as an invalid line or error is encountered')
-def process(*, langs: list[str], dbname: str, threshold: int, parallel: bool, processes: int, choose_langs: bool, force: bool, skip: bool, nazi: bool):
+@click.option('--writers', type=click.INT, default=0, show_default=True, help='If greater than 0, the buffered profiles are inserted on the database by this number of background threads')
+@click.option('--batch-bytes', type=click.INT, default=0, show_default=True, help='If greater than 0, the buffered profiles are flushed on the database also when their BSON size reaches this number of bytes')
+@click.option('-u', '--unordered/--no-unordered', is_flag=True, show_default=True, help='If the profiles will be inserted without order, counting the duplicated ones instead of failing')
+@click.option('--fid-index/--no-fid-index', is_flag=True, show_default=True, help='If an index on fid and line of the raw collection will be created before processing, so that the aggregation sorts the profiles by reading it')
+@click.option('--fid-ranges', type=click.INT, default=0, show_default=True, help='If greater than 1, each language is split into this number of fid ranges, computed by sampling the raw collection, and the ranges are processed in parallel by the given processes')
+@click.option('--output', type=click.Choice(['client', 'merge', 'out']), default='client', show_default=True, help='How the profiles are written in the parsed collection: streamed to the client and inserted again, or written on the server by the aggregation with $merge or $out. With fid ranges, out behaves as merge')
+@click.option('--engine', type=click.Choice(['db', 'local']), default='db', show_default=True, help='If the histories are built by a MongoDB aggregation or locally, by sorting the raw profiles in runs spilled on disk and merging them. The local engine ignores fid index and output')
+@click.option('--memory-budget', type=click.INT, default=2**29, show_default=True, help='If the engine is local, the bytes of raw profiles sorted in memory before being spilled on disk as a run')
+@click.option('--spill-dir', type=click.STRING, default=None, help='If the engine is local, the folder where the sorted runs are spilled. Default is the temporary folder of the system')
+@click.option('--metrics-dir', type=click.STRING, default=None, help='If given, the folder where the profiles processed and uploaded and the seconds spent in each stage are written, summed over all the processes, as metrics.json and as the Prometheus textfile metrics.prom')
+@click.option('--metrics-interval', type=click.FloatRange(min=0, min_open=True), default=10, show_default=True, help='If metrics dir is given, the seconds between two writes of the metrics')
+@click.option('--history', type=click.Choice(['full', 'delta']), default='full', show_default=True, help='If the history of a profile keeps its whole previous records or, for each one, only the fields that differ from the next newer record. Delta histories are built by the local engine and can be expanded with modules.postprocessor.utils.history.expand_history')
+def process(*, langs: list[str], dbname: str, threshold: int, parallel: bool, processes: int, choose_langs: bool, force: bool, skip: bool, nazi: bool, writers: int, batch_bytes: int, unordered: bool, fid_index: bool, fid_ranges: int, output: str, engine: str, memory_budget: int, spill_dir: Optional[str], metrics_dir: Optional[str], metrics_interval: float, history: str):
     postprocessor = Postprocessor(dbname)
     if choose_langs:
         available_langs = postprocessor.available_langs
         langs = select_languages(available_langs, langs)
-    postprocessor.process(langs, threshold, parallel, processes, force, skip, nazi)
+    postprocessor.process(langs, threshold, parallel, processes, force, skip, nazi, writers, batch_bytes, unordered, fid_index, fid_ranges, output, engine, memory_budget, spill_dir, metrics_dir, metrics_interval, history)
+
+
+@cli.command(help='Times each stage of the purge on a synthetic dataset generated for the schema of a language')
+@click.option('-l', '--lang', type=click.STRING, default='ITA', show_default=True, help='Language whose schema is used to generate the dataset')
+@click.option('--size', type=click.INT, default=2**24, show_default=True, help='Bytes of the generated dataset')
+@click.option('--assets', type=click.INT, default=2, show_default=True, help='Number of assets of the generated dataset, the last line of each asset continues on the next one')
+@click.option('--corruption', type=click.FLOAT, default=0.01, show_default=True, help='Share of the generated lines that are corrupted')
+@click.option('--format', 'fmt', type=click.Choice(['txt', 'bz2', 'gzip', 'xz', 'zstd']), default='bz2', show_default=True, help='Format of the generated assets, zstd requires zstandard')
+@click.option('--block-processes', type=click.INT, default=0, show_default=True, help='If greater than 1, the blocks of each bz2 asset are decompressed in parallel by this number of processes')
+@click.option('-t', '--threshold', type=click.INT, default=10000, show_default=True, help='Threshold of how many profiles will be buffered before being flushed')
+@click.option('--upload', type=click.Choice(['memory', 'mongo', 'none']), default='memory', show_default=True, help='Where the profiles are uploaded: encoded by an in-memory stand-in of the collection, on a local MongoDB or nowhere')
+@click.option('-d', '--dbname', type=click.STRING, default='fbl_benchmark', show_default=True, help='The name of the MongoDB database if uploading on MongoDB, the collection is dropped at the end')
+@click.option('--linear/--no-linear', is_flag=True, show_default=True, help='If lines will be matched with backtracking-free regexes in linear time, without the per-line timeout')
+@click.option('--seed', type=click.INT, default=0, show_default=True, help='Seed of the generated dataset')
+@click.option('--work-dir', type=click.STRING, default=None, help='Folder where the dataset is generated. Default is the temporary folder of the system')
+@click.option('-o', '--output', type=click.STRING, default=None, help='If given, the json file where the results are saved')
+@click.option('-b', '--baseline', type=click.STRING, default=None, help='If given, a json file of previous results to compare with, failing if a stage is slower')
+@click.option('--tolerance', type=click.FLOAT, default=0.1, show_default=True, help='Share of throughput that a stage can lose against the baseline before being a regression')
+def benchmark(*, lang: str, size: int, assets: int, corruption: float, fmt: str, block_processes: int, threshold: int, upload: str, dbname: str, linear: bool, seed: int, work_dir: Optional[str], output: Optional[str], baseline: Optional[str], tolerance: float):
+    results = Benchmark(lang, seed, work_dir).run(size, assets, corruption, fmt, block_processes, threshold, upload, dbname, linear)
+    if output:
+        save_results(results, output)
+    if baseline:
+        regressions = compare_results(results, baseline, tolerance)
+        if regressions:
+            raise click.ClickException(f'Slower than the baseline: {" ".join(regressions)}')
+
+
+@cli.command(help='Samples lines from the whole of each raw asset, matching them against the schema of its language and all the others, estimating its size and flagging odd line endings and leading junk')
+@click.option('-s', '--src', type=click.STRING, default='datasets', show_default=True, help='Folder containing the raw datasets')
+@click.option('-l', '--langs', type=click.STRING, multiple=True, default=['all'], show_default=True, help='Languages to check. If "all" is passed, all the languages are selected')
+@click.option('--samples', type=click.INT, default=1000, show_default=True, help='Number of lines sampled from each asset')
+@click.option('--chunks', type=click.INT, default=16, show_default=True, help='Number of chunks, spread over each asset, the lines are sampled from. For a bz2 asset a chunk is one of its blocks')
+@click.option('-p', '--parallel/--no-parallel', is_flag=True, show_default=True, help='If the assets will be checked in parallel')
+@click.option('--processes', type=click.INT, default=multiprocessing.cpu_count(), show_default=True, help='If parallel is active, specifies the number of parallel processes. Default is the number of cores of the CPU')
+@click.option('-w', '--wide/--no-wide', is_flag=True, show_default=True, help='If also txt files and not only compressed files (bz2, gz, xz, zst) will be considered')
+@click.option('--min-match-rate', type=click.FLOAT, default=0.9, show_default=True, help='Share of the sampled lines that must match the schema of the language for the asset not to be flagged')
+@click.option('-o', '--output', type=click.STRING, default=None, help='If given, the json file where the report of each asset is saved')
+def preflight(*, src: str, langs: list[str], samples: int, chunks: int, parallel: bool, processes: int, wide: bool, min_match_rate: float, output: Optional[str]):
+    reports = Preflight(src).check(langs, samples, chunks, parallel, processes, wide, min_match_rate)
+    if output:
+        save_report(reports, output)
+
+
+@cli.command(help='Converts the raw assets to another codec in parallel, replacing each one only after its lines are verified')
+@click.option('-s', '--src', type=click.STRING, default='datasets', show_default=True, help='Folder containing the raw datasets')
+@click.option('-l', '--langs', type=click.STRING, multiple=True, default=['all'], show_default=True, help='Languages to recompress. If "all" is passed, all the languages are selected')
+@click.option('--codec', type=click.Choice(['bz2', 'gzip', 'xz', 'zstd', 'plain']), default='xz', show_default=True, help='Codec of the recompressed assets, zstd requires zstandard. The codec of the original assets is detected from their first bytes')
+@click.option('--level', type=click.INT, default=None, help='Compression level, default is the default one of the codec')
+@click.option('-p', '--parallel/--no-parallel', is_flag=True, show_default=True, help='If the assets will be recompressed in parallel')
+@click.option('--processes', type=click.INT, default=multiprocessing.cpu_count(), show_default=True, help='If parallel is active, specifies the number of parallel processes. Default is the number of cores of the CPU')
+@click.option('-w', '--wide/--no-wide', is_flag=True, show_default=True, help='If also txt files and not only compressed files (bz2, gz, xz, zst) will be considered')
+@click.option('--keep/--no-keep', '-k', is_flag=True, default=True, show_default=True, help='If the original assets are kept. Purge would then read both the original and the recompressed ones, with --no-keep each original is deleted once the recompressed one has the same content')
+@click.option('-f', '--force/--no-force', is_flag=True, show_default=True, help='If already existing recompressed assets will be overwritten')
+def recompress(*, src: str, langs: list[str], codec: str, level: Optional[int], parallel: bool, processes: int, wide: bool, keep: bool, force: bool):
+    Recompressor(src).recompress(langs, codec, level, parallel, processes, wide, keep, force)
 
 
 @cli.group(help="Writes the available langs")
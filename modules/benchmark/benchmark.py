@@ -0,0 +1,181 @@
+import tempfile
+import time
+from json import dumps, loads
+from pathlib import Path
+from typing import Optional
+from bson import encode
+from bson.codec_options import DEFAULT_CODEC_OPTIONS
+from bson.raw_bson import RawBSONDocument
+
+from ..utils import logger as log
+from ..utils.bulkwriter import BulkWriter
+from ..utils.codecs import detect_codec, open_codec
+from ..purger.utils.bz2blocks import Bz2BlockReader
+from ..purger.utils.parser import Parser
+from ..purger.utils.uploader import Uploader
+from .utils.defaults import DEFAULT_LANG, DEFAULT_SIZE, DEFAULT_ASSETS, DEFAULT_CORRUPTION, DEFAULT_FORMAT, DEFAULT_BLOCK_PROCESSES, DEFAULT_THRESHOLD, DEFAULT_UPLOAD, DEFAULT_DBNAME, DEFAULT_TOLERANCE, DEFAULT_SEED, DEFAULT_LINEAR
+from .utils.generator import DatasetGenerator, ENCODING
+
+
+# Stand-in for a collection, it encodes the batches as pymongo would before sending them
+class NullCollection:
+    name = 'benchmark'
+    codec_options = DEFAULT_CODEC_OPTIONS
+
+    def insert_many(self, batch: list, ordered: bool = True) -> None:
+        for document in batch:
+            if not isinstance(document, RawBSONDocument):
+                encode(document)
+
+
+class Benchmark:
+
+    def __set_fields(self, size: int, assets: int, corruption: float, fmt: str, block_processes: int, threshold: int, upload: str, dbname: str, linear: bool):
+        self.size = size
+        self.assets = assets
+        self.corruption = corruption
+        self.fmt = fmt
+        self.block_processes = block_processes
+        self.threshold = threshold
+        self.upload = upload
+        self.dbname = dbname
+        self.linear = linear
+
+    def __print_settings(self) -> None:
+        print('---------------')
+        print(f'Language of the schema is {self.lang}')
+        print(f'Bytes of the generated dataset are {self.size}')
+        print(f'Assets of the generated dataset are {self.assets}')
+        print(f'Share of corrupted lines is {self.corruption}')
+        print(f'Format of the assets is {self.fmt}')
+        print(f'Processes decompressing the blocks of a bz2 asset: {self.block_processes}')
+        print(f'Threshold of bufferized profiles before updating is {self.threshold}')
+        print(f'Profiles are uploaded on: {self.upload}')
+        print(f'Will match lines in linear time without timeout: {self.linear}')
+        print('---------------')
+
+    def __read(self, lang_dir: Path) -> list[str]:
+        lines = []
+        for asset in sorted(lang_dir.iterdir()):
+            codec = detect_codec(asset)
+            if codec == 'bz2' and self.block_processes > 1:
+                input_file = Bz2BlockReader(asset, self.block_processes, ENCODING)
+            else:
+                input_file = open_codec(asset, 'rt', codec, encoding=ENCODING)
+            with input_file:
+                lines.extend(line.rstrip('\n') for line in input_file)
+        return lines
+
+    def __stage(self, name: str, seconds: float, amount: float, unit: str) -> None:
+        rate = amount / seconds if seconds else 0
+        self.stages[name] = {'seconds': seconds, 'rate': rate, 'unit': unit}
+        log.info(f'{name}: {rate:.1f} {unit} in {seconds:.3f}s', scope='Benchmark')
+
+    def __upload(self, profiles: list[dict]) -> None:
+        if self.upload == 'mongo':
+            uploader = Uploader(f'{self.lang}_Benchmark', 'benchmark', self.threshold, self.dbname, True)
+            uploader.check_and_add_index()
+            try:
+                for profile in profiles:
+                    uploader.append(profile)
+                uploader.upload()
+            finally:
+                uploader.collection.drop()
+                uploader.destroy()
+        else:
+            writer = BulkWriter(NullCollection(), self.threshold, 0, True, 0, self.lang)
+            for profile in profiles:
+                writer.append(profile)
+            writer.flush()
+            writer.close()
+
+    def __run(self, work_dir: Path) -> dict:
+        generator = DatasetGenerator(self.lang, self.seed)
+        lang_dir = generator.generate(work_dir, self.size, self.assets, self.corruption, self.fmt)
+
+        start = time.perf_counter()
+        lines = self.__read(lang_dir)
+        self.__stage('read', time.perf_counter() - start, sum(len(line) + 1 for line in lines) / 2**20, 'MB/s')
+
+        parser = Parser(self.lang, 'benchmark', False, self.linear)
+        start = time.perf_counter()
+        matched = [parser.match(line) for line in lines]
+        self.__stage('match', time.perf_counter() - start, len(lines), 'lines/s')
+
+        matched = [values for values in matched if values is not None]
+        start = time.perf_counter()
+        for index, values in enumerate(matched):
+            try:
+                parser.convert(values, index)
+            except (ValueError, IndexError):
+                pass
+        self.__stage('convert', time.perf_counter() - start, len(matched), 'docs/s')
+
+        # a corrupted line can match with values that cannot be converted, it is counted as an error
+        parser = Parser(self.lang, 'benchmark', False, self.linear)
+        profiles = []
+        errors = 0
+        start = time.perf_counter()
+        for index, line in enumerate(lines):
+            try:
+                profile = parser.parse_line(index, line)
+            except (ValueError, IndexError):
+                errors += 1
+                continue
+            if profile:
+                profiles.append(profile)
+        parser.close()
+        self.__stage('parse', time.perf_counter() - start, len(lines), 'lines/s')
+
+        if self.upload != 'none':
+            start = time.perf_counter()
+            self.__upload(profiles)
+            self.__stage('upload', time.perf_counter() - start, len(profiles), 'docs/s')
+
+        return {
+            'lang': self.lang,
+            'size': self.size,
+            'assets': self.assets,
+            'corruption': self.corruption,
+            'format': self.fmt,
+            'linear': self.linear,
+            'lines': len(lines),
+            'profiles': len(profiles),
+            'errors': errors,
+            'stages': self.stages
+        }
+
+    def __init__(self, lang=DEFAULT_LANG, seed=DEFAULT_SEED, work_dir: Optional[str] = None):
+        self.lang = lang
+        self.seed = seed
+        self.work_dir = work_dir
+        self.stages = {}
+
+    def run(self, size=DEFAULT_SIZE, assets=DEFAULT_ASSETS, corruption=DEFAULT_CORRUPTION, fmt=DEFAULT_FORMAT, block_processes=DEFAULT_BLOCK_PROCESSES, threshold=DEFAULT_THRESHOLD, upload=DEFAULT_UPLOAD, dbname=DEFAULT_DBNAME, linear=DEFAULT_LINEAR) -> dict:
+        self.__set_fields(size, assets, corruption, fmt, block_processes, threshold, upload, dbname, linear)
+        self.__print_settings()
+        self.stages = {}
+        with tempfile.TemporaryDirectory(dir=self.work_dir) as work_dir:
+            return self.__run(Path(work_dir))
+
+
+def save_results(results: dict, path: str) -> None:
+    with open(path, 'w') as results_file:
+        results_file.write(dumps(results, indent=4))
+
+
+def compare_results(results: dict, baseline_path: str, tolerance=DEFAULT_TOLERANCE) -> list[str]:
+    # returns the stages slower than the baseline by more than the tolerance
+    with open(baseline_path) as baseline_file:
+        baseline = loads(baseline_file.read())
+    regressions = []
+    for name, stage in results['stages'].items():
+        if name not in baseline['stages']:
+            continue
+        baseline_rate = baseline['stages'][name]['rate']
+        change = stage['rate'] / baseline_rate - 1 if baseline_rate else 0
+        log.info(f'{name}: {stage["rate"]:.1f} {stage["unit"]} against {baseline_rate:.1f}, {change:+.1%}', scope='Benchmark')
+        if change < -tolerance:
+            log.warn(f'{name} is slower than the baseline', scope='Benchmark')
+            regressions.append(name)
+    return regressions
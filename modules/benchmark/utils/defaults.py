@@ -0,0 +1,12 @@
+DEFAULT_LANG = 'ITA'
+DEFAULT_SIZE = 2**24
+DEFAULT_ASSETS = 2
+DEFAULT_CORRUPTION = 0.01
+DEFAULT_FORMAT = 'bz2'
+DEFAULT_BLOCK_PROCESSES = 0
+DEFAULT_THRESHOLD = 10000
+DEFAULT_UPLOAD = 'memory'
+DEFAULT_DBNAME = 'fbl_benchmark'
+DEFAULT_TOLERANCE = 0.1
+DEFAULT_SEED = 0
+DEFAULT_LINEAR = False
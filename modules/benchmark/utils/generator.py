@@ -0,0 +1,112 @@
+import random
+from pathlib import Path
+
+from ...utils.codecs import PLAIN, SUFFIXES, open_codec
+from ...purger.utils.schemas import fetch_schema
+
+ENCODING = 'ISO-8859-1'
+# probability that an optional value is empty
+EMPTY_RATE = 0.2
+WORDS = ['Mario', 'Rossi', 'Giulia', 'Bianchi', 'Roma', 'Milano', 'Napoli', 'single', 'married', 'engineer', 'student', 'male', 'female']
+UWORDS = ['José', 'Müller', 'Françoise', 'Çelik', 'Ñandú']
+PLACES = ['Roma, Italia', 'Roma', 'Milano, Lombardia, Italia']
+FREE_TEXTS = ['char', 'uchar', 'whole', 'whole_comma', 'whole_dbquotes', 'total_whole', 'place_comma']
+
+
+# Generates synthetic assets for a schema of schemas.json, with random values
+# matched by the regexp of each prop and a share of corrupted lines.
+class DatasetGenerator:
+
+    def __word(self) -> str:
+        words = self.random.randint(1, 2)
+        return ' '.join(self.random.choice(WORDS) for _ in range(words))
+
+    def __date(self) -> str:
+        return f'{self.random.randint(1, 12)}/{self.random.randint(1, 28)}/{self.random.randint(1950, 2005)}'
+
+    def __time(self, divider: str) -> str:
+        values = [str(self.random.randint(1, 12)), str(self.random.randint(0, 59)), str(self.random.randint(0, 59))]
+        return f'{divider.join(values)} {self.random.choice(["AM", "PM"])}'
+
+    def __value(self, regex: str, vtype: str) -> str:
+        if vtype == 'number':
+            return str(self.random.randint(10**14, 10**15 - 1))
+        if vtype == 'date':
+            return self.__date()
+        if regex == 'datetime' or (vtype == 'datetime' and regex != 'datetime_de'):
+            return f'{self.__date()} {self.__time(":")}'
+        if regex in ('numeric', 'phone'):
+            return f'{self.random.randint(10**9, 10**12)}'
+        if regex == 'char':
+            return self.random.choice(WORDS).replace(' ', '')
+        if regex == 'uchar':
+            return self.random.choice(UWORDS)
+        if regex == 'place_comma':
+            return self.random.choice(PLACES)
+        if regex == 'datetime_de':
+            return f'{self.__date()} {self.__time(",")}'
+        if regex == 'date':
+            return self.__date() if self.random.random() < 0.5 else self.__date().rsplit('/', 1)[0]
+        if regex == 'location_divider':
+            return 'Location*'
+        if regex == 'link_divider':
+            return 'link*'
+        return self.__word()
+
+    def __prop_value(self, details: dict) -> str:
+        if details['optional'] and details['regex'] not in ('location_divider', 'link_divider') and self.random.random() < EMPTY_RATE:
+            return ''
+        value = self.__value(details['regex'], details['type'])
+        # a free text never contains the chars that divide the values
+        if details['regex'] in FREE_TEXTS and any(char and char in value for char in (self.separator, self.attornator)):
+            return self.random.choice(WORDS).replace(' ', '')
+        return value
+
+    def __corrupt(self, line: str) -> str:
+        # a separator is lost or the line is truncated, as in the corrupted datasets
+        separators = [position for position, char in enumerate(line) if char == self.separator]
+        if separators and self.random.random() < 0.5:
+            position = self.random.choice(separators)
+            return line[:position] + line[position + 1:]
+        return line[:self.random.randrange(len(line))]
+
+    def __init__(self, lang: str, seed: int = 0):
+        self.lang = lang
+        self.schema = fetch_schema(lang)
+        self.separator = self.schema['separator']
+        self.attornator = self.schema['attornator']
+        self.random = random.Random(seed)
+
+    def line(self) -> str:
+        return self.separator.join(
+            f'{self.attornator}{self.__prop_value(details)}{self.attornator}'
+            for details in self.schema['props'].values()
+        )
+
+    def generate(self, out_dir: Path, size: int, assets: int, corruption: float, fmt: str) -> Path:
+        # assets of about size / assets bytes, the last line of each asset continues on the next one
+        lang_dir = out_dir.joinpath(f'{self.lang}_Benchmark')
+        lang_dir.mkdir(parents=True, exist_ok=True)
+        asset_size = size // assets
+        tail = ''
+        for index in range(assets):
+            codec = PLAIN if fmt == 'txt' else fmt
+            path = lang_dir.joinpath('.'.join([str(index), 'txt']) + ('' if codec == PLAIN else SUFFIXES[codec]))
+            with open_codec(path, 'wt', codec, encoding=ENCODING, newline='') as asset:
+                written = 0
+                if tail:
+                    asset.write(tail + '\n')
+                    written += len(tail) + 1
+                    tail = ''
+                while written < asset_size:
+                    line = self.line()
+                    if self.random.random() < corruption:
+                        line = self.__corrupt(line)
+                    if written + len(line) + 1 >= asset_size and index < assets - 1:
+                        split = len(line) // 2
+                        asset.write(line[:split])
+                        tail = line[split:]
+                        break
+                    asset.write(line + '\n')
+                    written += len(line) + 1
+        return lang_dir
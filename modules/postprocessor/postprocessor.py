@@ -1,14 +1,20 @@
+from typing import Optional
 from joblib import Parallel, delayed
+from pymongo.collection import Collection
 
 from ..utils import logger as log
+from ..utils import metrics
+from ..utils.scheduler import largest_first
 from .utils.dbschema import DbSchema
-from .utils.dbprocessor import DbProcessor
-from .utils.defaults import DEFAULT_LANGS, DEFAULT_DBNAME, DEFAULT_THRESHOLD, DEFAULT_PARALLEL, DEFAULT_PROCESSES, DEFAULT_FORCE, DEFAULT_SKIP, DEFAULT_NAZI
+from .utils.dbprocessor import DbProcessor, add_fid_index
+from .utils.localprocessor import LocalProcessor
+from .utils.fidranges import compute_fid_ranges
+from .utils.defaults import DEFAULT_LANGS, DEFAULT_DBNAME, DEFAULT_THRESHOLD, DEFAULT_PARALLEL, DEFAULT_PROCESSES, DEFAULT_FORCE, DEFAULT_SKIP, DEFAULT_NAZI, DEFAULT_WRITERS, DEFAULT_BATCH_BYTES, DEFAULT_UNORDERED, DEFAULT_FID_INDEX, DEFAULT_FID_RANGES, DEFAULT_OUTPUT, DEFAULT_ENGINE, DEFAULT_MEMORY_BUDGET, DEFAULT_SPILL_DIR, DEFAULT_METRICS_DIR, DEFAULT_METRICS_INTERVAL, DEFAULT_HISTORY
 
 
 class Postprocessor:
 
-    def __set_fields(self, langs: list[str], threshold: int, parallel: bool, processes: int, force: bool, skip: bool, nazi: bool):
+    def __set_fields(self, langs: list[str], threshold: int, parallel: bool, processes: int, force: bool, skip: bool, nazi: bool, writers: int, batch_bytes: int, unordered: bool, fid_index: bool, fid_ranges: int, output: str, engine: str, memory_budget: int, spill_dir: Optional[str], metrics_dir: Optional[str], metrics_interval: float, history: str):
         self.langs = self.available_langs if 'all' in langs else langs
         self.threshold = threshold
         self.parallel = parallel
@@ -16,6 +22,20 @@ class Postprocessor:
         self.force = force
         self.skip = skip
         self.nazi = nazi
+        self.writers = writers
+        self.batch_bytes = batch_bytes
+        self.unordered = unordered
+        self.fid_index = fid_index
+        self.fid_ranges = fid_ranges
+        # $out would replace the slices written by the other ranges
+        self.output = 'merge' if output == 'out' and fid_ranges > 1 else output
+        # a delta history is built while merging the runs, without pushing the records of a fid in an array
+        self.engine = 'local' if history == 'delta' else engine
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.metrics_dir = metrics_dir
+        self.metrics_interval = metrics_interval
+        self.history = history
 
     def __print_settings(self) -> None:
         print('---------------')
@@ -30,20 +50,42 @@ class Postprocessor:
         print(
             f'If a parsed collection already exists, will I skip it? {self.skip}')
         print(f'If a line fails, will I terminate the program? {self.nazi}')
+        print(f'Background threads inserting the buffered profiles: {self.writers}')
+        print(f'Bytes of bufferized profiles before updating: {self.batch_bytes}')
+        print(f'Will I insert without order, counting duplicates? {self.unordered}')
+        print(f'Will I create the fid index before processing? {self.fid_index}')
+        print(f'Fid ranges processed in parallel for each language: {self.fid_ranges}')
+        print(f'Profiles are written by: {self.output}')
+        print(f'Histories are built by the engine: {self.engine}')
+        print(f'If the engine is local, bytes of profiles sorted in memory before spilling a run: {self.memory_budget}')
+        print(f'If the engine is local, runs are spilled in: {self.spill_dir or "the temporary dir"}')
+        print(f'Metrics are written in: {self.metrics_dir or "nowhere"}')
+        print(f'Seconds between two writes of the metrics: {self.metrics_interval}')
+        print(f'History of each profile is stored as: {self.history}')
         print('---------------')
 
     def __process(self) -> None:
         if self.parallel:
+            # the largest raw collections are processed first, the workers that finish early take the remaining ones
+            dbschema = DbSchema(self.dbname)
+            sizes = [dbschema.retrieve_lang_raw_size(lang) for lang in self.langs]
+            dbschema.destroy()
             Parallel(n_jobs=self.processes)(
                 delayed(self._process_lang)(lang)
-                for lang in self.langs
+                for lang in largest_first(self.langs, sizes)
             )
         else:
             for lang in self.langs:
                 self._process_lang(lang)
 
+    def __create_processor(self, lang: str, raw_coll: Collection, parsed_coll: Collection, fid_range: Optional[dict]):
+        if self.engine == 'local':
+            return LocalProcessor(lang, self.threshold, raw_coll, parsed_coll, self.writers, self.batch_bytes, not self.unordered, fid_range, self.memory_budget, self.spill_dir, self.history)
+        return DbProcessor(lang, self.threshold, raw_coll, parsed_coll, self.writers, self.batch_bytes, not self.unordered, self.fid_index, fid_range, self.output)
+
     def _process_lang(self, lang: str) -> None:
         log.info('Start processing lang', lang=lang)
+        metrics.setup(self.metrics_dir, self.metrics_interval)
         dbschema = DbSchema(self.dbname)
 
         raw_coll = dbschema.retrieve_lang_raw_coll(lang)
@@ -64,22 +106,64 @@ class Postprocessor:
                 txt = 'Parsed collection already exists'
                 log.err(txt, lang=lang)
                 raise Exception(txt)
+            elif self.output == 'out' and self.engine == 'db':
+                # $out would replace the existing profiles instead of adding to them
+                txt = 'Parsed collection already exists, $out would replace it without force'
+                log.err(txt, lang=lang)
+                raise Exception(txt)
         else:
             parsed_coll = dbschema.create_lang_parsed_coll(lang)
 
-        dbprocessor = DbProcessor(lang, self.threshold, raw_coll, parsed_coll)
+        if self.fid_ranges > 1:
+            # the ranges share the index, it is created before they are sampled and processed
+            if self.fid_index and self.engine == 'db':
+                log.info('Start creating fid index', lang=lang)
+                add_fid_index(raw_coll)
+                log.succ('End creating fid index', lang=lang)
+            fid_ranges = compute_fid_ranges(raw_coll, self.fid_ranges)
+            dbschema.destroy()
+            # each range has its own connection and writes its own slice of the parsed collection
+            Parallel(n_jobs=self.processes)(
+                delayed(self._process_fid_range)(lang, fid_range, index)
+                for index, fid_range in enumerate(fid_ranges)
+            )
+            log.succ('Finish processing lang', lang=lang)
+            return
+
+        dbprocessor = self.__create_processor(lang, raw_coll, parsed_coll, None)
         dbprocessor.lavora()
 
         dbschema.destroy()
+        metrics.flush()
         log.succ('Finish processing lang', lang=lang)
 
+    def _process_fid_range(self, lang: str, fid_range: dict, index: int) -> None:
+        log.debug(f'Start processing fid range {index}', lang=lang)
+        metrics.setup(self.metrics_dir, self.metrics_interval)
+        dbschema = DbSchema(self.dbname)
+        raw_coll = dbschema.retrieve_lang_raw_coll(lang)
+        parsed_coll = dbschema.create_lang_parsed_coll(lang)
+
+        dbprocessor = self.__create_processor(lang, raw_coll, parsed_coll, fid_range)
+        dbprocessor.lavora()
+
+        dbschema.destroy()
+        metrics.flush()
+        log.debug(f'Finish processing fid range {index}', lang=lang)
+
     def __init__(self, dbname=DEFAULT_DBNAME):
         self.dbname = dbname
 
         dbschema = DbSchema(dbname)
         self.available_langs = dbschema.retrieve_langs()
+        dbschema.destroy()
 
-    def process(self, langs: list[str] = DEFAULT_LANGS, threshold=DEFAULT_THRESHOLD, parallel=DEFAULT_PARALLEL, processes=DEFAULT_PROCESSES, force=DEFAULT_FORCE, skip=DEFAULT_SKIP, nazi=DEFAULT_NAZI) -> None:
-        self.__set_fields(langs, threshold, parallel, processes, force, skip, nazi)
+    def process(self, langs: list[str] = DEFAULT_LANGS, threshold=DEFAULT_THRESHOLD, parallel=DEFAULT_PARALLEL, processes=DEFAULT_PROCESSES, force=DEFAULT_FORCE, skip=DEFAULT_SKIP, nazi=DEFAULT_NAZI, writers=DEFAULT_WRITERS, batch_bytes=DEFAULT_BATCH_BYTES, unordered=DEFAULT_UNORDERED, fid_index=DEFAULT_FID_INDEX, fid_ranges=DEFAULT_FID_RANGES, output=DEFAULT_OUTPUT, engine=DEFAULT_ENGINE, memory_budget=DEFAULT_MEMORY_BUDGET, spill_dir=DEFAULT_SPILL_DIR, metrics_dir=DEFAULT_METRICS_DIR, metrics_interval=DEFAULT_METRICS_INTERVAL, history=DEFAULT_HISTORY) -> None:
+        self.__set_fields(langs, threshold, parallel, processes, force, skip, nazi, writers, batch_bytes, unordered, fid_index, fid_ranges, output, engine, memory_budget, spill_dir, metrics_dir, metrics_interval, history)
         self.__print_settings()
-        self.__process()
+        reporter = metrics.Reporter(self.metrics_dir, self.metrics_interval)
+        reporter.start()
+        try:
+            self.__process()
+        finally:
+            reporter.stop()
@@ -1,23 +1,19 @@
 from pymongo.collection import Collection
-from ...utils import logger as log
+from ...utils.bulkwriter import BulkWriter
 
 
 class BatchUploader:
-    def __init__(self, lang: str, threshold: int, collection: Collection):
+    def __init__(self, lang: str, threshold: int, collection: Collection, writers: int = 0, batch_bytes: int = 0, ordered: bool = True):
         self.lang = lang
         self.threshold = threshold
         self.collection = collection
-        self.buffer = []
+        self.writer = BulkWriter(collection, threshold, batch_bytes, ordered, writers, lang)
 
     def flush(self) -> None:
-        if self.buffer:
-            n_elements = len(self.buffer)
-            log.debug(f'Uploading {n_elements} elements', lang=self.lang)
-            self.collection.insert_many(self.buffer)
-            self.buffer = []
-            log.debug(f'Uploaded {n_elements} elements', lang=self.lang)
+        self.writer.flush()
+
+    def close(self) -> None:
+        self.writer.close()
 
     def add(self, profile: dict) -> None:
-        self.buffer.append(profile)
-        if len(self.buffer) == self.threshold:
-            self.flush()
+        self.writer.append(profile)
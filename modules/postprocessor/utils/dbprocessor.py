@@ -1,14 +1,31 @@
+import threading
+import time
+from typing import Optional
+from pymongo import ASCENDING
 from pymongo.collection import Collection, CommandCursor
 
 from ...utils import logger as log
+from ...utils import metrics
 from .batchuploader import BatchUploader
 
+# seconds between two progress reports of a server-side output
+PROGRESS_INTERVAL = 30
+
+
+def add_fid_index(raw_coll: Collection) -> None:
+    raw_coll.create_index(
+        [('fid', ASCENDING), ('line', ASCENDING)], name='fidLineIndex')
+
 
 class DbProcessor:
 
-    def __fetch_processed_data(self) -> CommandCursor:
+    def __build_pipeline(self) -> list[dict]:
+        # with the fid index the sort is read from the index, the order of the lines of a fid is the same
         sort_by_line = {
             '$sort': {
+                'fid': 1,
+                'line': 1
+            } if self.fid_index else {
                 'line': 1
             }
         }
@@ -68,21 +85,79 @@ class DbProcessor:
                 'history.line': False
             }
         }
-        return self.raw_coll.aggregate([sort_by_line, group_by_fid, handle_history, flat_current, remove_id_and_line], allowDiskUse=True)
+        pipeline = [sort_by_line, group_by_fid, handle_history, flat_current, remove_id_and_line]
+        # when processing a fid range, only its profiles are sorted and grouped
+        if self.fid_range:
+            pipeline.insert(0, {'$match': self.fid_range})
+        return pipeline
+
+    def __fetch_processed_data(self) -> CommandCursor:
+        return self.raw_coll.aggregate(self.__build_pipeline(), allowDiskUse=True)
+
+    def __report_progress(self, done: threading.Event) -> None:
+        while not done.wait(PROGRESS_INTERVAL):
+            written = self.parsed_coll.estimated_document_count()
+            log.info(f'{written} profiles written in the parsed collection', lang=self.lang)
+
+    def __write_processed_data(self) -> None:
+        # the profiles never leave the server, $out replaces the collection while $merge adds to it
+        if self.output == 'out':
+            stage = {'$out': self.parsed_coll.name}
+        else:
+            stage = {'$merge': {'into': self.parsed_coll.name, 'whenMatched': 'fail', 'whenNotMatched': 'insert'}}
+        done = threading.Event()
+        reporter = threading.Thread(target=self.__report_progress, args=(done,), daemon=True)
+        # $out writes a temporary collection renamed at the end, the target does not grow meanwhile
+        if self.output == 'out':
+            log.info('$out gives no progress until the aggregation ends', lang=self.lang)
+        else:
+            reporter.start()
+        start = time.perf_counter()
+        try:
+            self.raw_coll.aggregate(self.__build_pipeline() + [stage], allowDiskUse=True)
+        finally:
+            done.set()
+            if reporter.is_alive():
+                reporter.join()
+        metrics.add('seconds_aggregate', time.perf_counter() - start, self.lang)
 
     def __upload_processed_data(self, data: CommandCursor):
-        uploader = BatchUploader(self.lang, self.threshold, self.parsed_coll)
+        uploader = BatchUploader(self.lang, self.threshold, self.parsed_coll, self.writers, self.batch_bytes, self.ordered)
+        # fetching includes the time the server spends sorting and grouping before the first batch
+        clock = metrics.StageClock(self.lang)
         for profile in data:
+            clock.lap('fetch')
+            clock.count('profiles_processed')
             uploader.add(profile)
+            clock.lap('upload')
         uploader.flush()
+        uploader.close()
+        clock.lap('upload')
+        clock.close()
 
-    def __init__(self, lang: str, threshold: int, raw_coll: Collection, parsed_coll: Collection):
+    def __init__(self, lang: str, threshold: int, raw_coll: Collection, parsed_coll: Collection, writers: int = 0, batch_bytes: int = 0, ordered: bool = True, fid_index: bool = False, fid_range: Optional[dict] = None, output: str = 'client'):
         self.lang = lang
+        self.output = output
+        self.fid_range = fid_range
+        self.fid_index = fid_index
         self.threshold = threshold
+        self.writers = writers
+        self.batch_bytes = batch_bytes
+        self.ordered = ordered
         self.raw_coll = raw_coll
         self.parsed_coll = parsed_coll
 
     def lavora(self) -> None:
+        # the index of a fid range is created once for the whole language
+        if self.fid_index and not self.fid_range:
+            log.info('Start creating fid index', lang=self.lang)
+            add_fid_index(self.raw_coll)
+            log.succ('End creating fid index', lang=self.lang)
+        if self.output != 'client':
+            log.info(f'Start writing data with ${self.output}', lang=self.lang)
+            self.__write_processed_data()
+            log.succ(f'End writing data with ${self.output}', lang=self.lang)
+            return
         log.info('Start fetching data', lang=self.lang)
         profiles = self.__fetch_processed_data()
         log.succ('End fetching data', lang=self.lang)
@@ -1,8 +1,9 @@
 import re
-from pymongo import MongoClient
 from pymongo.collection import Collection
 from typing import Optional
 
+from ...utils.mongo import get_database
+
 
 class DbSchema:
 
@@ -28,8 +29,7 @@ class DbSchema:
             return None
 
     def __init__(self, dbname: str):
-        self.client = MongoClient()
-        self.database = self.client.get_database(dbname)
+        self.database = get_database(dbname)
         self.collections = self.__retrieve_collections()
 
     def retrieve_langs(self) -> list[str]:
@@ -47,6 +47,14 @@ class DbSchema:
         lang_obj = self.__get_coll_from_lang(lang, False)
         return lang_obj['collection'] if lang_obj else None
 
+    def retrieve_lang_raw_size(self, lang: str) -> int:
+        # uncompressed bytes of the raw collection, 0 if it does not exist
+        raw_coll = self.retrieve_lang_raw_coll(lang)
+        if raw_coll is None:
+            return 0
+        stats = next(raw_coll.aggregate([{'$collStats': {'storageStats': {}}}]), None)
+        return stats['storageStats']['size'] if stats else 0
+
     def retrieve_lang_parsed_coll(self, lang: str) -> Optional[Collection]:
         lang_obj = self.__get_coll_from_lang(lang, True)
         return lang_obj['collection'] if lang_obj else None
@@ -58,4 +66,5 @@ class DbSchema:
         return parsed_coll
 
     def destroy(self) -> None:
-        self.client.close()
+        # the connection is shared by the process, only the collections are forgotten
+        self.collections = []
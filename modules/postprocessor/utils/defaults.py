@@ -8,3 +8,15 @@ DEFAULT_PROCESSES = multiprocessing.cpu_count()
 DEFAULT_FORCE = False
 DEFAULT_SKIP = False
 DEFAULT_NAZI = False
+DEFAULT_WRITERS = 0
+DEFAULT_BATCH_BYTES = 0
+DEFAULT_UNORDERED = False
+DEFAULT_FID_INDEX = False
+DEFAULT_FID_RANGES = 0
+DEFAULT_OUTPUT = 'client'
+DEFAULT_ENGINE = 'db'
+DEFAULT_MEMORY_BUDGET = 2**29
+DEFAULT_SPILL_DIR = None
+DEFAULT_METRICS_DIR = None
+DEFAULT_METRICS_INTERVAL = 10
+DEFAULT_HISTORY = 'full'
@@ -0,0 +1,24 @@
+from pymongo.collection import Collection
+
+# sampled profiles for each range, the more they are the more even the ranges
+SAMPLES_PER_RANGE = 1000
+
+
+def compute_fid_ranges(collection: Collection, n_ranges: int) -> list[dict]:
+    # conditions on fid that split the collection in ranges of about the same size, each fid in exactly one
+    samples = collection.aggregate([
+        {'$sample': {'size': n_ranges * SAMPLES_PER_RANGE}},
+        {'$match': {'fid': {'$type': 'number'}}},
+        {'$project': {'_id': False, 'fid': True}}
+    ], allowDiskUse=True)
+    fids = sorted(sample['fid'] for sample in samples)
+    if not fids:
+        return [{}]
+    quantiles = sorted({fids[len(fids) * index // n_ranges] for index in range(1, n_ranges)})
+    if not quantiles:
+        return [{}]
+    # the first range also takes the profiles with a missing or not numeric fid
+    ranges = [{'fid': {'$not': {'$gte': quantiles[0]}}}]
+    ranges += [{'fid': {'$gte': lower, '$lt': upper}} for lower, upper in zip(quantiles, quantiles[1:])]
+    ranges.append({'fid': {'$gte': quantiles[-1]}})
+    return ranges
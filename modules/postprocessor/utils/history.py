@@ -0,0 +1,35 @@
+from typing import Iterator
+
+# key of a delta listing the fields that the older record did not have
+MISSING = '_missing'
+
+
+def _delta(record: dict, newer: dict) -> dict:
+    delta = {key: value for key, value in record.items() if key not in newer or newer[key] != value}
+    missing = [key for key in newer if key not in record]
+    if missing:
+        delta[MISSING] = missing
+    return delta
+
+
+def delta_history(records: list[dict], current: dict) -> list[dict]:
+    # the records, oldest first, each one keeping only the fields that differ from the next newer one
+    newer_records = records[1:] + [current]
+    return [_delta(record, newer) for record, newer in zip(records, newer_records)]
+
+
+def iter_snapshots(profile: dict) -> Iterator[dict]:
+    # the whole records of a delta history, newest first, starting from the current profile
+    snapshot = {key: value for key, value in profile.items() if key != 'history'}
+    for delta in reversed(profile.get('history', [])):
+        snapshot = {**snapshot, **delta}
+        for key in snapshot.pop(MISSING, []):
+            snapshot.pop(key, None)
+        yield snapshot
+
+
+def expand_history(profile: dict) -> dict:
+    # the profile with the full history, oldest first, as if it was processed without delta
+    expanded = {key: value for key, value in profile.items() if key != 'history'}
+    expanded['history'] = list(iter_snapshots(profile))[::-1]
+    return expanded
@@ -0,0 +1,117 @@
+import heapq
+import tempfile
+import time
+from itertools import groupby
+from pathlib import Path
+from typing import Iterator, Optional
+from bson import decode_file_iter
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo.collection import Collection
+
+from ...utils import logger as log
+from ...utils import metrics
+from .batchuploader import BatchUploader
+from .history import delta_history
+
+# estimated memory of a buffered profile besides its BSON bytes
+PROFILE_OVERHEAD = 200
+
+
+def _fid_key(profile) -> tuple:
+    # profiles are grouped as $group does, a missing fid is grouped with the null ones
+    fid = profile.get('fid')
+    return (type(fid).__name__, fid)
+
+
+def _sort_key(profile) -> tuple:
+    return _fid_key(profile) + (profile['line'],)
+
+
+def _strip(profile: dict) -> dict:
+    return {key: value for key, value in profile.items() if key not in ('_id', 'line')}
+
+
+# Builds the same profiles of DbProcessor without aggregating on MongoDB:
+# the raw collection is streamed into sorted runs spilled on disk, that are
+# then merged to group the profiles of each fid ordered by line.
+class LocalProcessor:
+
+    def __write_run(self, buffer: list[tuple[tuple, bytes]]) -> Path:
+        buffer.sort(key=lambda item: item[0])
+        run_path = Path(self.spill_dir.name).joinpath(f'run{len(self.runs)}.bson')
+        with open(run_path, 'wb') as run_file:
+            for _, raw in buffer:
+                run_file.write(raw)
+        log.debug(f'Spilled run of {len(buffer)} profiles', lang=self.lang)
+        return run_path
+
+    def __spill_sorted_runs(self) -> None:
+        raw_coll = self.raw_coll.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+        buffer = []
+        buffer_bytes = 0
+        for profile in raw_coll.find(self.fid_range or {}):
+            # only the key and the bytes of the profile are kept
+            buffer.append((_sort_key(profile), profile.raw))
+            buffer_bytes += len(profile.raw) + PROFILE_OVERHEAD
+            if buffer_bytes >= self.memory_budget:
+                self.runs.append(self.__write_run(buffer))
+                buffer = []
+                buffer_bytes = 0
+        if buffer:
+            self.runs.append(self.__write_run(buffer))
+
+    def __iter_run(self, run_path: Path) -> Iterator[dict]:
+        with open(run_path, 'rb') as run_file:
+            yield from decode_file_iter(run_file)
+
+    def __merge_runs(self) -> Iterator[dict]:
+        merged = heapq.merge(*[self.__iter_run(run_path) for run_path in self.runs], key=_sort_key)
+        for _, group in groupby(merged, key=_fid_key):
+            profiles = [_strip(profile) for profile in group]
+            current = profiles[-1]
+            # a delta history keeps of each record only what changed in the next one
+            current['history'] = delta_history(profiles[:-1], current) if self.history == 'delta' else profiles[:-1]
+            yield current
+
+    def __upload_processed_data(self, data: Iterator[dict]) -> None:
+        uploader = BatchUploader(self.lang, self.threshold, self.parsed_coll, self.writers, self.batch_bytes, self.ordered)
+        clock = metrics.StageClock(self.lang)
+        for profile in data:
+            clock.lap('merge')
+            clock.count('profiles_processed')
+            uploader.add(profile)
+            clock.lap('upload')
+        uploader.flush()
+        uploader.close()
+        clock.lap('upload')
+        clock.close()
+
+    def __init__(self, lang: str, threshold: int, raw_coll: Collection, parsed_coll: Collection, writers: int = 0, batch_bytes: int = 0, ordered: bool = True, fid_range: Optional[dict] = None, memory_budget: int = 2**29, spill_dir: Optional[str] = None, history: str = 'full'):
+        self.lang = lang
+        self.threshold = threshold
+        self.writers = writers
+        self.batch_bytes = batch_bytes
+        self.ordered = ordered
+        self.raw_coll = raw_coll
+        self.parsed_coll = parsed_coll
+        self.fid_range = fid_range
+        self.memory_budget = memory_budget
+        self.spill_dir_root = spill_dir
+        self.history = history
+        self.runs = []
+
+    def lavora(self) -> None:
+        self.spill_dir = tempfile.TemporaryDirectory(dir=self.spill_dir_root)
+        try:
+            log.info('Start spilling sorted runs', lang=self.lang)
+            start = time.perf_counter()
+            self.__spill_sorted_runs()
+            metrics.add('seconds_spill', time.perf_counter() - start, self.lang)
+            log.succ(f'End spilling {len(self.runs)} sorted runs', lang=self.lang)
+            log.info('Start merging and uploading data', lang=self.lang)
+            self.__upload_processed_data(self.__merge_runs())
+            log.succ('End merging and uploading data', lang=self.lang)
+        finally:
+            self.spill_dir.cleanup()
+            self.runs = []
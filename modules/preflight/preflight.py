@@ -0,0 +1,129 @@
+from functools import lru_cache
+from json import dumps
+from pathlib import Path
+from joblib import Parallel, delayed
+
+from ..utils import logger as log
+from ..purger.utils.filedir import FileDir
+from ..purger.utils.parser import Parser
+from ..purger.utils.schemas import _load_schemas
+from .utils.defaults import DEFAULT_SRC, DEFAULT_LANGS, DEFAULT_SAMPLES, DEFAULT_CHUNKS, DEFAULT_PARALLEL, DEFAULT_PROCESSES, DEFAULT_WIDE, DEFAULT_MIN_MATCH_RATE
+from .utils.sampler import AssetSampler
+
+ENCODING = 'ISO-8859-1'
+
+
+@lru_cache(maxsize=None)
+def _schema_parsers() -> list[tuple[list[str], Parser]]:
+    # the langs sharing the same schema are matched once, built once per process
+    groups = {}
+    for name, schema in _load_schemas().items():
+        groups.setdefault(dumps(schema, sort_keys=True), []).append(name)
+    # lines are matched in linear time where possible, a wrong schema must not hit the timeout on each line
+    return [(names, Parser(names[0], 'preflight', False, True)) for names in groups.values()]
+
+
+class Preflight:
+
+    def __set_fields(self, langs: list[str], samples: int, chunks: int, parallel: bool, processes: int, wide: bool, min_match_rate: float):
+        self.langs = self.available_langs if 'all' in langs else langs
+        self.samples = samples
+        self.chunks = chunks
+        self.parallel = parallel
+        self.processes = processes
+        self.wide = wide
+        self.min_match_rate = min_match_rate
+
+    def __print_settings(self) -> None:
+        print('---------------')
+        print(f'Datasets dir is {self.src}')
+        print(f'Languages to check are {" ".join(self.langs)}')
+        print(f'Lines sampled from each asset: {self.samples}')
+        print(f'Chunks of each asset the lines are sampled from: {self.chunks}')
+        print(f'Will I try to parallelize? {self.parallel}')
+        print(f'If I parallelize, I will use {self.processes} processes')
+        print(f'Will consider also txt files: {self.wide}')
+        print(f'Share of sampled lines that must match the schema: {self.min_match_rate}')
+        print('---------------')
+
+    def __match_rates(self, lines: list[str]) -> dict:
+        rates = {}
+        for names, parser in _schema_parsers():
+            matched = sum(1 for line in lines if parser.match(line) is not None)
+            rates[' '.join(names)] = matched / len(lines) if lines else 0.0
+        return dict(sorted(rates.items(), key=lambda item: item[1], reverse=True))
+
+    def __flags(self, report: dict) -> list[str]:
+        flags = []
+        if report['match_rate'] < self.min_match_rate:
+            flags.append(f'only {report["match_rate"]:.1%} of the sampled lines match the schema')
+        best_schema, best_rate = next(iter(report['schemas'].items()))
+        if best_rate > report['match_rate']:
+            flags.append(f'the schema of {best_schema} matches {best_rate:.1%} of the sampled lines')
+        endings = report['endings']
+        if endings['dos'] > endings['unix']:
+            flags.append('DOS line endings')
+        if endings['mac'] > endings['unix'] + endings['dos']:
+            flags.append('Mac line endings')
+        if report['junk']:
+            flags.append(f'{report["junk"]} junk bytes before the first line')
+        return flags
+
+    def _check_asset(self, lang: str, asset: Path) -> dict:
+        log.info('Start checking asset', lang=lang, asset=asset.name)
+        sample = AssetSampler(asset).sample(self.samples, self.chunks)
+        lines = [line.decode(ENCODING) for line in sample['lines']]
+        schemas = self.__match_rates(lines)
+        own_name = lang if lang in _load_schemas() else 'default'
+        own_names = next(' '.join(names) for names, _ in _schema_parsers() if own_name in names)
+        report = {
+            'lang': lang,
+            'asset': asset.name,
+            'size': asset.stat().st_size,
+            'estimated_bytes': sample['estimated_bytes'],
+            'estimated_lines': sample['estimated_lines'],
+            'sampled_lines': len(lines),
+            'match_rate': schemas[own_names],
+            'schemas': schemas,
+            'endings': sample['endings'],
+            'junk': sample['junk']
+        }
+        report['flags'] = self.__flags(report)
+        for flag in report['flags']:
+            log.warn(flag, lang=lang, asset=asset.name)
+        log.succ(f'About {report["estimated_lines"]} lines and {report["estimated_bytes"]} bytes, {report["match_rate"]:.1%} of the sampled lines match the schema',
+                 lang=lang, asset=asset.name)
+        return report
+
+    def __init__(self, src=DEFAULT_SRC):
+        self.src = src
+        self.filedir = FileDir(Path(src))
+        self.available_langs = self.filedir.retrieve_langs()
+
+    def check(self, langs: list[str] = DEFAULT_LANGS, samples=DEFAULT_SAMPLES, chunks=DEFAULT_CHUNKS, parallel=DEFAULT_PARALLEL, processes=DEFAULT_PROCESSES, wide=DEFAULT_WIDE, min_match_rate=DEFAULT_MIN_MATCH_RATE) -> list[dict]:
+        self.__set_fields(langs, samples, chunks, parallel, processes, wide, min_match_rate)
+        self.__print_settings()
+        units = [
+            (lang, asset)
+            for lang in self.langs
+            for asset in self.filedir.retrieve_lang_assets(lang, self.wide)
+        ]
+        if self.parallel:
+            reports = Parallel(n_jobs=self.processes)(
+                delayed(self._check_asset)(lang, asset)
+                for lang, asset in units
+            )
+        else:
+            reports = [self._check_asset(lang, asset) for lang, asset in units]
+
+        for lang in self.langs:
+            lang_reports = [report for report in reports if report['lang'] == lang]
+            flagged = sum(1 for report in lang_reports if report['flags'])
+            log.info(f'About {sum(report["estimated_lines"] for report in lang_reports)} lines and {sum(report["estimated_bytes"] for report in lang_reports)} bytes, {flagged} of {len(lang_reports)} assets flagged',
+                     lang=lang)
+        return reports
+
+
+def save_report(reports: list[dict], path: str) -> None:
+    with open(path, 'w') as report_file:
+        report_file.write(dumps(reports, indent=4))
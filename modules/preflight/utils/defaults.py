@@ -0,0 +1,10 @@
+import multiprocessing
+
+DEFAULT_SRC = 'datasets'
+DEFAULT_LANGS = ['all']
+DEFAULT_SAMPLES = 1000
+DEFAULT_CHUNKS = 16
+DEFAULT_PARALLEL = False
+DEFAULT_PROCESSES = multiprocessing.cpu_count()
+DEFAULT_WIDE = False
+DEFAULT_MIN_MATCH_RATE = 0.9
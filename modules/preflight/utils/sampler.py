@@ -0,0 +1,131 @@
+from pathlib import Path
+
+from ...utils.codecs import PLAIN, detect_codec, open_codec
+from ...purger.utils.bz2blocks import find_blocks, decompress_block
+
+# bytes read at each offset of a plain asset
+WINDOW = 2**16
+# bytes at the start of an asset inspected for junk
+HEAD = 2**10
+# bytes that never start a line of a dataset
+BOMS = [b'\xef\xbb\xbf', b'\xff\xfe', b'\xfe\xff']
+JUNK_BYTES = set(range(0x20)) - {0x09, 0x0a, 0x0d}
+
+
+def _spread(n_items: int, n_samples: int) -> list[int]:
+    # indexes spread evenly from the start to the end
+    if n_items <= n_samples:
+        return list(range(n_items))
+    return sorted({round(index * (n_items - 1) / (n_samples - 1)) for index in range(n_samples)}) if n_samples > 1 else [0]
+
+
+def _split_lines(data: bytes) -> list[bytes]:
+    # universal newlines, as the purge reads the assets
+    return data.replace(b'\r\n', b'\n').replace(b'\r', b'\n').split(b'\n')
+
+
+def count_line_endings(data: bytes) -> dict:
+    dos = data.count(b'\r\n')
+    return {'unix': data.count(b'\n') - dos, 'dos': dos, 'mac': data.count(b'\r') - dos}
+
+
+def leading_junk(head: bytes) -> int:
+    # number of bytes before the first line that cannot belong to it
+    for bom in BOMS:
+        if head.startswith(bom):
+            return len(bom) + leading_junk(head[len(bom):])
+    junk = 0
+    while junk < len(head) and head[junk] in JUNK_BYTES:
+        junk += 1
+    return junk
+
+
+# Reads a sample of the lines of an asset from chunks spread over the whole
+# file, estimating its lines and decompressed bytes from the chunks.
+class AssetSampler:
+
+    def __sample_bz2(self, n_chunks: int) -> tuple[list[bytes], int]:
+        blocks = find_blocks(self.path)
+        if not blocks:
+            return [], 0
+        chunks = []
+        for index in _spread(len(blocks), n_chunks):
+            try:
+                chunks.append(decompress_block(self.path, *blocks[index]))
+            except (OSError, ValueError):
+                # the range of a magic number found inside the compressed data, it is not sampled
+                continue
+        if not chunks:
+            return [], 0
+        self.head = chunks[0][:HEAD]
+        # the last block is shorter, the estimate is good enough to size a run
+        decompressed = sum(len(chunk) for chunk in chunks) * len(blocks) // len(chunks)
+        return chunks, decompressed
+
+    def __sample_plain(self, n_chunks: int) -> tuple[list[bytes], int]:
+        size = self.path.stat().st_size
+        n_windows = max(size // WINDOW, 1)
+        chunks = []
+        with open(self.path, 'rb') as asset:
+            self.head = asset.read(HEAD)
+            for index in _spread(n_windows, n_chunks):
+                asset.seek(index * WINDOW)
+                chunks.append(asset.read(WINDOW))
+        return chunks, size
+
+    def __sample_stream(self, codec: str, n_chunks: int) -> tuple[list[bytes], int]:
+        # a gzip, xz or zstd asset cannot be read from the middle, the chunks are the first windows
+        size = self.path.stat().st_size
+        chunks = []
+        with open(self.path, 'rb') as raw, open_codec(raw, 'rb', codec) as asset:
+            for _ in range(n_chunks):
+                chunk = asset.read(WINDOW)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            consumed = raw.tell()
+        self.head = chunks[0][:HEAD] if chunks else b''
+        # the compression ratio of the start holds for the whole asset, unless it was all read
+        decompressed = sum(len(chunk) for chunk in chunks)
+        if consumed < size:
+            decompressed = decompressed * size // max(consumed, 1)
+        return chunks, decompressed
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.head = b''
+
+    def sample(self, n_lines: int, n_chunks: int) -> dict:
+        codec = detect_codec(self.path)
+        if codec == 'bz2':
+            chunks, decompressed = self.__sample_bz2(n_chunks)
+        elif codec == PLAIN:
+            chunks, decompressed = self.__sample_plain(n_chunks)
+        else:
+            chunks, decompressed = self.__sample_stream(codec, n_chunks)
+        # only the whole lines of each chunk are kept, the first one of a chunk can be partial
+        lines_per_chunk = []
+        endings = {'unix': 0, 'dos': 0, 'mac': 0}
+        for index, chunk in enumerate(chunks):
+            for ending, count in count_line_endings(chunk).items():
+                endings[ending] += count
+            lines = _split_lines(chunk)
+            # the first line of a chunk is partial unless the chunk starts the asset, the last one can always be
+            lines_per_chunk.append(lines[:-1] if index == 0 else lines[1:-1])
+        sampled_bytes = sum(len(chunk) for chunk in chunks)
+        breaks = sum(endings.values())
+        estimated_lines = round(breaks * decompressed / sampled_bytes) if sampled_bytes else 0
+        # the lines are taken evenly from every chunk
+        per_chunk = max(n_lines // max(len(chunks), 1), 1)
+        lines = [
+            line
+            for chunk_lines in lines_per_chunk
+            for line in (chunk_lines[index] for index in _spread(len(chunk_lines), per_chunk))
+        ]
+        return {
+            'lines': lines,
+            'endings': endings,
+            'junk': leading_junk(self.head),
+            'estimated_bytes': decompressed,
+            'estimated_lines': estimated_lines
+        }
@@ -1,17 +1,28 @@
-import bz2
+import time
+from itertools import accumulate
 from pathlib import Path
+from typing import Optional
 from joblib import Parallel, delayed
 
 from ..utils import logger as log
-from .utils.defaults import DEFAULT_JUMP_LINES, DEFAULT_SRC, DEFAULT_LANGS, DEFAULT_DBNAME, DEFAULT_THRESHOLD, DEFAULT_BIAS, DEFAULT_PARALLEL, DEFAULT_PROCESSES, DEFAULT_FORCE, DEFAULT_SKIP, DEFAULT_OCTOPUS, DEFAULT_NAZI, DEFAULT_SKIP_FIRST_LINE, DEFAULT_WIDE
+from ..utils import metrics
+from ..utils.codecs import PLAIN, detect_codec, open_codec
+from ..utils.scheduler import RunHistory, weighted_size, estimate_costs, largest_first
+from .utils.defaults import DEFAULT_JUMP_LINES, DEFAULT_SRC, DEFAULT_LANGS, DEFAULT_DBNAME, DEFAULT_THRESHOLD, DEFAULT_BIAS, DEFAULT_PARALLEL, DEFAULT_PROCESSES, DEFAULT_FORCE, DEFAULT_SKIP, DEFAULT_OCTOPUS, DEFAULT_NAZI, DEFAULT_SKIP_FIRST_LINE, DEFAULT_WIDE, DEFAULT_LINEAR, DEFAULT_BLOCK_PROCESSES, DEFAULT_SHARDS, DEFAULT_WRITERS, DEFAULT_BATCH_BYTES, DEFAULT_UNORDERED, DEFAULT_RAW_BSON, DEFAULT_RESUME, DEFAULT_CHECKPOINTS, DEFAULT_BULK_LOAD, DEFAULT_SINK, DEFAULT_OUT_DIR, DEFAULT_QUARANTINE, DEFAULT_METRICS_DIR, DEFAULT_METRICS_INTERVAL, DEFAULT_INCREMENTAL, DEFAULT_CATALOG, DEFAULT_BINARY
 from .utils.filedir import FileDir
 from .utils.uploader import Uploader
+from .utils.checkpoint import Checkpoint
+from .utils.catalog import Catalog
 from .utils.parser import Parser
+from .utils.schemas import fetch_schema
+from .utils.quarantine import Quarantine, quarantine_path
+from .utils.bz2blocks import Bz2BlockReader
+from .utils.sharder import compute_shards, count_line_breaks, ends_with_line_break, iter_shard_lines, BinaryLineReader
 
 
 class Purger:
 
-    def __set_fields(self, langs: list[str], dbname: str, threshold: int, bias: int, parallel: bool, processes: int, force: bool, skip: bool, octopus: bool, nazi: bool, skip_first_line: bool, wide: bool, jump_lines: int):
+    def __set_fields(self, langs: list[str], dbname: str, threshold: int, bias: int, parallel: bool, processes: int, force: bool, skip: bool, octopus: bool, nazi: bool, skip_first_line: bool, wide: bool, jump_lines: int, linear: bool, block_processes: int, shards: int, writers: int, batch_bytes: int, unordered: bool, raw_bson: bool, resume: bool, checkpoints: str, bulk_load: bool, sink: str, out_dir: str, quarantine: Optional[str], metrics_dir: Optional[str], metrics_interval: float, incremental: bool, catalog: str, binary: bool):
         self.langs = self.available_langs if 'all' in langs else langs
         self.dbname = dbname
         self.threshold = threshold
@@ -25,6 +36,26 @@ class Purger:
         self.skip_first_line = skip_first_line
         self.wide = wide
         self.jump_lines = jump_lines
+        self.linear = linear
+        self.block_processes = block_processes
+        self.shards = shards
+        self.writers = writers
+        self.batch_bytes = batch_bytes
+        self.unordered = unordered
+        self.raw_bson = raw_bson
+        self.resume = resume
+        self.checkpoints = checkpoints
+        self.bulk_load = bulk_load
+        self.sink = sink
+        self.out_dir = out_dir
+        self.quarantine = quarantine
+        self.metrics_dir = metrics_dir
+        self.metrics_interval = metrics_interval
+        # the durations of the last purge are kept next to the checkpoints
+        self.history = RunHistory(checkpoints)
+        self.incremental = incremental
+        self.catalog = catalog
+        self.binary = binary
 
     def __print_settings(self) -> None:
         print('---------------')
@@ -45,49 +76,217 @@ class Purger:
         print(f'If a line fails, will I terminate the program? {self.nazi}')
         print(f'Skip first line: {self.skip_first_line}')
         print(f'Will consider also txt files: {self.wide}')
+        print(f'Will match lines in linear time without timeout: {self.linear}')
+        print(f'Processes decompressing the blocks of a bz2 asset: {self.block_processes}')
+        print(f'Shards purged in parallel for each txt asset: {self.shards}')
+        print(f'Background threads inserting the buffered profiles: {self.writers}')
+        print(f'Bytes of bufferized profiles before updating: {self.batch_bytes}')
+        print(f'Will I insert without order, counting duplicates? {self.unordered}')
+        print(f'Will I buffer the profiles already encoded as BSON? {self.raw_bson}')
+        print(f'Will I resume from the last checkpoints? {self.resume}')
+        print(f'Checkpoints dir is {self.checkpoints}')
+        print(f'Will I build the line index only at the end of each language? {self.bulk_load}')
+        print(f'Profiles are written on: {self.sink}')
+        print(f'If profiles are written on files, output dir is {self.out_dir}')
+        print(f'Rejected lines are saved in: {self.quarantine or "nowhere"}')
+        print(f'Metrics are written in: {self.metrics_dir or "nowhere"}')
+        print(f'Seconds between two writes of the metrics: {self.metrics_interval}')
+        print(f'Will I purge only the new and changed assets? {self.incremental}')
+        print(f'Catalog dir is {self.catalog}')
+        print(f'Will I read the lines as bytes, decoding only the kept values? {self.binary}')
         print('---------------')
 
+    def __asset_costs(self, lang: str, assets: list[Path]) -> list[float]:
+        lang_full_name = self.filedir.retrieve_lang_fullname(lang)
+        histories = [self.history.load(self.dbname, lang_full_name, asset.name) for asset in assets]
+        return estimate_costs([weighted_size(asset) for asset in assets], histories)
+
     def __purge(self) -> None:
+        # the costliest work units are dispatched first, the workers that finish early take the remaining ones
         if self.parallel:
             if self.octopus:
+                units, costs = [], []
+                for lang in self.langs:
+                    assets = self.__plan_lang(lang)
+                    # the first asset drops or checks the collection before any other asset of the lang is purged
+                    if assets and (self.incremental or self.__prepare_lang(lang, assets[0][1])):
+                        units.extend((lang, asset, index) for index, asset in assets)
+                        costs.extend(self.__asset_costs(lang, [asset for _, asset in assets]))
                 Parallel(n_jobs=self.processes)(
-                    delayed(self._purge_asset)(lang, asset, index)
-                    for lang in self.langs
-                    for index, asset in enumerate(self.filedir.retrieve_lang_assets(lang, self.wide))
+                    delayed(self._purge_asset)(lang, asset, index, True)
+                    for lang, asset, index in largest_first(units, costs)
                 )
+                if self.bulk_load:
+                    for lang in self.langs:
+                        self.__add_deferred_index(lang)
             else:
+                costs = [sum(self.__asset_costs(lang, self.filedir.retrieve_lang_assets(lang, self.wide))) for lang in self.langs]
                 Parallel(n_jobs=self.processes)(
                     delayed(self._purge_lang)(lang)
-                    for lang in self.langs
+                    for lang in largest_first(self.langs, costs)
                 )
         else:
             for lang in self.langs:
                 self._purge_lang(lang)
 
-    def _purge_asset(self, lang: str, asset: Path, index: int) -> None:
-        log.info('Start purging asset', lang=lang, asset=asset.name)
+    def __plan_lang(self, lang: str) -> list[tuple[int, Path]]:
+        # the assets to purge with their index, when incremental only the new and changed ones
+        assets = self.filedir.retrieve_lang_assets(lang, self.wide)
+        if not self.incremental:
+            return list(enumerate(assets))
+        lang_full_name = self.filedir.retrieve_lang_fullname(lang)
+        catalog = Catalog(self.catalog, self.dbname, lang_full_name)
+        entries = catalog.entries()
+        names = {asset.name for asset in assets}
+        # a new asset gets an index never used, so that its lines do not overlap the others
+        next_index = max((entry['index'] for entry in entries.values()), default=-1) + 1
+        units = []
+        uploader = Uploader(lang_full_name, None, self.threshold, self.dbname, False)
+        try:
+            # without a catalog the lines of the assets already purged are unknown, they would be inserted again
+            if not entries and uploader.collection_exists():
+                txt = f'{lang_full_name} was purged without a catalog, purge it once with --force to record it'
+                log.err(txt, lang=lang)
+                raise Exception(txt)
+            # stale entries sharing an index would delete the lines of another asset
+            indexes = [entry['index'] for entry in entries.values()]
+            shared = sorted({index for index in indexes if indexes.count(index) > 1})
+            if shared:
+                txt = f'Catalog of {lang_full_name} has several assets with index {", ".join(map(str, shared))}, purge it once with --force to record it again'
+                log.err(txt, lang=lang)
+                raise Exception(txt)
+            for name, entry in entries.items():
+                if name not in names:
+                    deleted = uploader.delete_lines(entry['first_line'], entry['last_line'])
+                    catalog.remove(name)
+                    log.warn(f'Asset removed, {deleted} profiles deleted', lang=lang, asset=name)
+            for asset in assets:
+                entry = entries.get(asset.name)
+                if entry is None:
+                    units.append((next_index, asset))
+                    next_index += 1
+                elif catalog.is_unchanged(asset):
+                    log.info('Skipping purging, asset unchanged', lang=lang, asset=asset.name)
+                else:
+                    # the changed asset keeps its index, its old lines are replaced
+                    deleted = uploader.delete_lines(entry['first_line'], entry['last_line'])
+                    catalog.remove(asset.name)
+                    log.info(f'Asset changed, {deleted} profiles deleted', lang=lang, asset=asset.name)
+                    units.append((entry['index'], asset))
+        finally:
+            uploader.destroy()
+        return units
 
-        bias = self.bias * index
-        parser = Parser(lang, asset.name, self.nazi)
+    def __open_asset(self, asset: Path):
+        # binary lines are bytes with the same line breaks of the text ones
+        encoding = None if self.binary else 'ISO-8859-1'
+        codec = detect_codec(asset)
+        if codec == 'bz2' and self.block_processes > 1:
+            return Bz2BlockReader(asset, self.block_processes, encoding)
+        if self.binary:
+            return BinaryLineReader(asset, codec)
+        return open_codec(asset, 'rt', codec, encoding=encoding)
+
+    def __load_checkpoint(self, lang: str, name: str) -> tuple[Checkpoint, Optional[int]]:
+        # returns the checkpoint and the number of input lines already committed, or None if done
+        checkpoint = Checkpoint(self.checkpoints, self.dbname, self.filedir.retrieve_lang_fullname(lang), name)
+        if not self.resume:
+            checkpoint.clear()
+            return checkpoint, 0
+        state = checkpoint.load()
+        if state is None:
+            return checkpoint, 0
+        if state['done']:
+            return checkpoint, None
+        log.info(f'Resuming from line {state["line"]}', lang=lang, asset=name)
+        return checkpoint, state['position']
 
+    def __open_quarantine(self, lang: str, name: str) -> Optional[Quarantine]:
+        if not self.quarantine:
+            return None
         lang_full_name = self.filedir.retrieve_lang_fullname(lang)
-        uploader = Uploader(lang_full_name, asset.name,
-                            self.threshold, self.dbname, self.force and index == 0)
+        return Quarantine(quarantine_path(self.quarantine, lang_full_name, name), lang, lang_full_name, name)
 
+    def __check_output(self, uploader: Uploader, lang: str, asset: Path, first: bool, replaying: bool) -> bool:
+        # returns False if the collection of the lang already exists and it is skipped
         try:
-            uploader.check_and_add_index()
+            # an interrupted asset gets the index before replaying, the first run inserted no duplicates
+            if replaying:
+                uploader.add_index()
+            elif self.bulk_load:
+                uploader.check_collection()
+            else:
+                uploader.check_and_add_index()
         except Exception as err:
-            if index == 0:
+            if first:
                 if self.skip:
                     log.warn('Skipping purging, collection already exists',
                              lang=lang, asset=asset.name)
-                    return
+                    return False
                 else:
                     log.err('Collection already exists',
                             lang=lang, asset=asset.name)
                     raise err
+        # the first asset dropped or created the collection, the old entries no longer match its lines
+        if first and not replaying and self.sink == 'mongo':
+            Catalog(self.catalog, self.dbname, self.filedir.retrieve_lang_fullname(lang)).clear()
+        return True
+
+    def __prepare_lang(self, lang: str, asset: Path) -> bool:
+        # done by the main process, since the assets of the lang can be purged in any order
+        _, position = self.__load_checkpoint(lang, asset.name)
+        if position is None:
+            return True
+        lang_full_name = self.filedir.retrieve_lang_fullname(lang)
+        uploader = Uploader(lang_full_name, asset.name, self.threshold, self.dbname, self.force,
+                            sink=self.sink, out_dir=self.out_dir, schema=fetch_schema(lang))
+        try:
+            return self.__check_output(uploader, lang, asset, True, self.resume and position > 0)
+        finally:
+            uploader.destroy()
+
+    def _purge_asset(self, lang: str, asset: Path, index: int, prepared: bool = False) -> None:
+        log.info('Start purging asset', lang=lang, asset=asset.name)
+        metrics.setup(self.metrics_dir, self.metrics_interval)
+        start_time = time.time()
+
+        bias = self.bias * index
+        # unless the lang was prepared, the first asset drops or checks the collection
+        first = index == 0 and not prepared
+
+        checkpoint, position = self.__load_checkpoint(lang, asset.name)
+        if position is None:
+            log.warn('Skipping purging, asset already purged',
+                     lang=lang, asset=asset.name)
+            return
+
+        # the checkpoint is saved every time the batches up to a line are committed
+        def save_checkpoint(line: int) -> None:
+            checkpoint.save(line, line - bias + 1)
+
+        lang_full_name = self.filedir.retrieve_lang_fullname(lang)
+        # replayed batches are inserted without order, so that the duplicated profiles are only counted
+        uploader = Uploader(lang_full_name, asset.name,
+                            self.threshold, self.dbname, self.force and first, self.writers, self.batch_bytes, not self.unordered and not self.resume, self.raw_bson, save_checkpoint,
+                            self.sink, self.out_dir, fetch_schema(lang))
+
+        # an incremental purge adds to the existing collection
+        if not self.__check_output(uploader, lang, asset, first, (self.resume and position > 0) or self.incremental):
+            uploader.destroy()
+            return
 
-        with (bz2.open if asset.suffix == '.bz2' else open)(asset, 'rt', encoding='ISO-8859-1') as input_file:
+        if self.shards > 1 and detect_codec(asset) == PLAIN:
+            uploader.destroy()
+            lines = self.__purge_shards(lang, asset, index, bias)
+            checkpoint.finish()
+            self.__record_duration(lang, asset, start_time)
+            self.__record_catalog(lang, asset, index, bias, lines)
+            log.succ('Finish purging asset', lang=lang, asset=asset.name)
+            return
+
+        quarantine = self.__open_quarantine(lang, asset.name)
+        parser = Parser(lang, asset.name, self.nazi, self.linear, quarantine, self.binary)
+        with self.__open_asset(asset) as input_file:
             lines_to_skip = self.jump_lines
 
             def skip_line():
@@ -105,22 +304,137 @@ class Purger:
             while lines_to_skip > 0:
                 skip_line()
             # do the real job
-            for index, line in enumerate(input_file):
-                line = line.rstrip('\n')
-                profile = parser.parse_line(bias + index, line)
+            clock = metrics.StageClock(lang)
+            # a binary line can end with the \r\n or the \r it had in the asset
+            newline = b'\r\n' if self.binary else '\n'
+            line_index = -1
+            for line_index, line in enumerate(input_file):
+                clock.lap('read')
+                # lines already committed before the resume
+                if line_index < position:
+                    continue
+                clock.count('lines_read')
+                clock.count('bytes_read', len(line))
+                line = line.rstrip(newline)
+                profile = parser.parse_line(bias + line_index, line)
+                clock.lap('parse')
                 if profile:
+                    clock.count('lines_parsed')
                     uploader.append(profile)
+                    clock.lap('upload')
             uploader.upload()
+            clock.lap('upload')
+            clock.close()
 
+        parser.close()
+        if quarantine:
+            quarantine.close()
         uploader.destroy()
+        checkpoint.finish()
+        metrics.flush()
+        self.__record_duration(lang, asset, start_time)
+        self.__record_catalog(lang, asset, index, bias, line_index + 1)
 
         log.succ('Finish purging asset', lang=lang, asset=asset.name)
 
+    def __record_catalog(self, lang: str, asset: Path, index: int, bias: int, lines: int) -> None:
+        # the line fields of the asset are between its bias and its bias plus its lines
+        if self.sink == 'mongo':
+            Catalog(self.catalog, self.dbname, self.filedir.retrieve_lang_fullname(lang)).record(asset, index, bias, lines)
+
+    def __record_duration(self, lang: str, asset: Path, start_time: float) -> None:
+        # a resumed asset took only part of the time, its duration is not representative
+        if not self.resume:
+            self.history.record(weighted_size(asset), time.time() - start_time, self.dbname, self.filedir.retrieve_lang_fullname(lang), asset.name)
+
+    def __purge_shards(self, lang: str, asset: Path, index: int, bias: int) -> int:
+        # returns the number of lines of the asset
+        shards = compute_shards(asset, self.shards)
+        # the line breaks before each shard give the exact index of its first line
+        line_breaks = Parallel(n_jobs=self.shards)(
+            delayed(count_line_breaks)(asset, start, end)
+            for start, end in shards
+        )
+        first_lines = accumulate([0] + line_breaks[:-1])
+        # as in the serial purge, skipping the first line counts as one of the jumped lines
+        skipped_lines = max(self.jump_lines, 1) if index > 0 and self.skip_first_line else self.jump_lines
+        Parallel(n_jobs=self.shards)(
+            delayed(self._purge_shard)(lang, asset, bias, start, end, first_line - skipped_lines)
+            for (start, end), first_line in zip(shards, first_lines)
+        )
+        # the last line is counted only if it has no line break, the skipped lines are not counted as in the serial purge
+        lines = sum(line_breaks) + (not ends_with_line_break(asset))
+        return max(lines - skipped_lines, 0)
+
+    def _purge_shard(self, lang: str, asset: Path, bias: int, start: int, end: int, first_index: int) -> None:
+        log.debug(f'Start purging shard {start}-{end}', lang=lang, asset=asset.name)
+        metrics.setup(self.metrics_dir, self.metrics_interval)
+
+        checkpoint, position = self.__load_checkpoint(lang, f'{asset.name}.{start}-{end}')
+        if position is None:
+            log.debug(f'Skipping shard {start}-{end}, already purged', lang=lang, asset=asset.name)
+            return
+
+        def save_checkpoint(line: int) -> None:
+            checkpoint.save(line, line - bias - first_index + 1)
+
+        quarantine = self.__open_quarantine(lang, f'{asset.name}.{start}-{end}')
+        parser = Parser(lang, asset.name, self.nazi, self.linear, quarantine, self.binary)
+        lang_full_name = self.filedir.retrieve_lang_fullname(lang)
+        # on files each shard has its own output
+        uploader = Uploader(lang_full_name, asset.name if self.sink == 'mongo' else f'{asset.name}.{start}-{end}', self.threshold, self.dbname, False, self.writers, self.batch_bytes, not self.unordered and not self.resume, self.raw_bson, save_checkpoint,
+                            self.sink, self.out_dir, fetch_schema(lang))
+
+        clock = metrics.StageClock(lang)
+        newline = b'\r\n' if self.binary else '\n'
+        for shard_index, line in enumerate(iter_shard_lines(asset, start, end, None if self.binary else 'ISO-8859-1')):
+            clock.lap('read')
+            index = first_index + shard_index
+            # lines skipped at the beginning of the asset or already committed before the resume
+            if index < 0 or shard_index < position:
+                continue
+            clock.count('lines_read')
+            clock.count('bytes_read', len(line))
+            line = line.rstrip(newline)
+            profile = parser.parse_line(bias + index, line)
+            clock.lap('parse')
+            if profile:
+                clock.count('lines_parsed')
+                uploader.append(profile)
+                clock.lap('upload')
+        uploader.upload()
+        clock.lap('upload')
+        clock.close()
+
+        parser.close()
+        if quarantine:
+            quarantine.close()
+        uploader.destroy()
+        checkpoint.finish()
+        metrics.flush()
+
+        log.debug(f'Finish purging shard {start}-{end}', lang=lang, asset=asset.name)
+
+    def __add_deferred_index(self, lang: str) -> None:
+        log.info('Start building line index', lang=lang)
+        lang_full_name = self.filedir.retrieve_lang_fullname(lang)
+        uploader = Uploader(lang_full_name, None, self.threshold, self.dbname, False, sink=self.sink, out_dir=self.out_dir)
+        try:
+            conflicts = uploader.add_deferred_index()
+        finally:
+            uploader.destroy()
+        if conflicts:
+            if self.nazi:
+                raise Exception(f'{lang_full_name} has {conflicts} duplicated lines')
+            return
+        log.succ('Finish building line index', lang=lang)
+
     def _purge_lang(self, lang: str) -> None:
         log.info('Start purging lang', lang=lang)
-        assets_paths = self.filedir.retrieve_lang_assets(lang, self.wide)
-        for index, asset_path in enumerate(assets_paths):
+        for index, asset_path in self.__plan_lang(lang):
             self._purge_asset(lang, asset_path, index)
+        if self.bulk_load:
+            self.__add_deferred_index(lang)
         log.succ('Finish purging lang', lang=lang)
 
     def __init__(self, src=DEFAULT_SRC):
@@ -129,8 +443,25 @@ class Purger:
         self.filedir = FileDir(src_path)
         self.available_langs = self.filedir.retrieve_langs()
 
-    def purge(self, langs: list[str] = DEFAULT_LANGS, dbname=DEFAULT_DBNAME, threshold=DEFAULT_THRESHOLD, bias=DEFAULT_BIAS, parallel=DEFAULT_PARALLEL, processes=DEFAULT_PROCESSES, force=DEFAULT_FORCE, skip=DEFAULT_SKIP, octopus=DEFAULT_OCTOPUS, nazi=DEFAULT_NAZI, skip_first_line=DEFAULT_SKIP_FIRST_LINE, wide=DEFAULT_WIDE, jump_lines=DEFAULT_JUMP_LINES) -> None:
+    def purge(self, langs: list[str] = DEFAULT_LANGS, dbname=DEFAULT_DBNAME, threshold=DEFAULT_THRESHOLD, bias=DEFAULT_BIAS, parallel=DEFAULT_PARALLEL, processes=DEFAULT_PROCESSES, force=DEFAULT_FORCE, skip=DEFAULT_SKIP, octopus=DEFAULT_OCTOPUS, nazi=DEFAULT_NAZI, skip_first_line=DEFAULT_SKIP_FIRST_LINE, wide=DEFAULT_WIDE, jump_lines=DEFAULT_JUMP_LINES, linear=DEFAULT_LINEAR, block_processes=DEFAULT_BLOCK_PROCESSES, shards=DEFAULT_SHARDS, writers=DEFAULT_WRITERS, batch_bytes=DEFAULT_BATCH_BYTES, unordered=DEFAULT_UNORDERED, raw_bson=DEFAULT_RAW_BSON, resume=DEFAULT_RESUME, checkpoints=DEFAULT_CHECKPOINTS, bulk_load=DEFAULT_BULK_LOAD, sink=DEFAULT_SINK, out_dir=DEFAULT_OUT_DIR, quarantine=DEFAULT_QUARANTINE, metrics_dir=DEFAULT_METRICS_DIR, metrics_interval=DEFAULT_METRICS_INTERVAL, incremental=DEFAULT_INCREMENTAL, catalog=DEFAULT_CATALOG, binary=DEFAULT_BINARY) -> None:
         self.__set_fields(langs, dbname, threshold, bias, parallel,
-                          processes, force, skip, octopus, nazi, skip_first_line, wide, jump_lines)
+                          processes, force, skip, octopus, nazi, skip_first_line, wide, jump_lines, linear, block_processes, shards, writers, batch_bytes, unordered, raw_bson, resume, checkpoints, bulk_load, sink, out_dir, quarantine, metrics_dir, metrics_interval, incremental, catalog, binary)
         self.__print_settings()
-        self.__purge()
+        if self.resume and self.sink != 'mongo':
+            txt = 'Resuming is supported only when writing on MongoDB'
+            log.err(txt)
+            raise Exception(txt)
+        if self.incremental and self.sink != 'mongo':
+            txt = 'Incremental purge is supported only when writing on MongoDB, the catalog records only the collections'
+            log.err(txt)
+            raise Exception(txt)
+        if self.incremental and (self.resume or self.force):
+            txt = 'Incremental purge cannot resume or force'
+            log.err(txt)
+            raise Exception(txt)
+        reporter = metrics.Reporter(self.metrics_dir, self.metrics_interval)
+        reporter.start()
+        try:
+            self.__purge()
+        finally:
+            reporter.stop()
@@ -0,0 +1,87 @@
+from itertools import chain
+from pathlib import Path
+from joblib import Parallel, delayed
+
+from ..utils import logger as log
+from .utils.defaults import DEFAULT_LANGS, DEFAULT_DBNAME, DEFAULT_THRESHOLD, DEFAULT_PARALLEL, DEFAULT_PROCESSES, DEFAULT_NAZI, DEFAULT_LINEAR, DEFAULT_QUARANTINE_DIR
+from .utils.uploader import Uploader
+from .utils.parser import Parser
+from .utils.quarantine import Quarantine, EXTENSION, iter_quarantine
+
+
+class Reprocessor:
+
+    def __set_fields(self, langs: list[str], dbname: str, threshold: int, parallel: bool, processes: int, nazi: bool, linear: bool):
+        self.langs = langs
+        self.dbname = dbname
+        self.threshold = threshold
+        self.parallel = parallel
+        self.processes = processes
+        self.nazi = nazi
+        self.linear = linear
+
+    def __print_settings(self) -> None:
+        print('---------------')
+        print(f'Quarantine dir is {self.src}')
+        print(f'Languages to reprocess are {" ".join(self.langs)}')
+        print(f'Name of db is {self.dbname}')
+        print(
+            f'Threshold of bufferized profiles before updating is {self.threshold}')
+        print(f'Will I try to parallelize? {self.parallel}')
+        print(f'If I parallelize, I will use {self.processes} processes')
+        print(f'If a line fails, will I terminate the program? {self.nazi}')
+        print(f'Will match lines in linear time without timeout: {self.linear}')
+        print('---------------')
+
+    def __retrieve_quarantines(self) -> list[Path]:
+        paths = sorted(self.src.glob(f'*/*{EXTENSION}'))
+        if 'all' in self.langs:
+            return paths
+        langs = [lang.lower() for lang in self.langs]
+        return [path for path in paths if path.parent.name.split('_')[0].lower() in langs]
+
+    def _reprocess_quarantine(self, path: Path) -> None:
+        log.info(f'Start reprocessing {path.name}')
+        # the lines still rejected replace the quarantine once it is read
+        records = iter_quarantine(path)
+        first = next(records, None)
+        if first is None:
+            return
+        lang, language, asset = first['lang'], first['language'], first['asset']
+        quarantine = Quarantine(path, lang, language, asset)
+        parser = Parser(lang, asset, self.nazi, self.linear, quarantine)
+        # duplicated lines are only counted, the quarantine can be reprocessed more times
+        uploader = Uploader(language, asset, self.threshold, self.dbname, False, ordered=False)
+        uploader.add_index()
+
+        previous_index = None
+        for record in chain([first], records):
+            # only adjacent lines can be joined
+            if previous_index is not None and record['line'] != previous_index + 1:
+                parser.close()
+            previous_index = record['line']
+            profile = parser.parse_line(record['line'], record['text'])
+            if profile:
+                uploader.append(profile)
+        uploader.upload()
+
+        parser.close()
+        quarantine.close()
+        uploader.destroy()
+        log.succ(f'Finish reprocessing {path.name}, {quarantine.rejected} lines still rejected', lang=lang, asset=asset)
+
+    def __init__(self, src=DEFAULT_QUARANTINE_DIR):
+        self.src = Path(src)
+
+    def reprocess(self, langs: list[str] = DEFAULT_LANGS, dbname=DEFAULT_DBNAME, threshold=DEFAULT_THRESHOLD, parallel=DEFAULT_PARALLEL, processes=DEFAULT_PROCESSES, nazi=DEFAULT_NAZI, linear=DEFAULT_LINEAR) -> None:
+        self.__set_fields(langs, dbname, threshold, parallel, processes, nazi, linear)
+        self.__print_settings()
+        paths = self.__retrieve_quarantines()
+        if self.parallel:
+            Parallel(n_jobs=self.processes)(
+                delayed(self._reprocess_quarantine)(path)
+                for path in paths
+            )
+        else:
+            for path in paths:
+                self._reprocess_quarantine(path)
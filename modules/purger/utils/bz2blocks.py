@@ -0,0 +1,159 @@
+import bz2
+import mmap
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from ...utils import logger as log
+
+# 48 bits magic numbers that start a bzip2 block and the end of a bzip2 stream
+BLOCK_MAGIC = 0x314159265359
+EOS_MAGIC = 0x177245385090
+MAGIC_BITS = 48
+CRC_BITS = 32
+# consecutive ranges joined when a block cannot be decompressed, before giving up
+MAX_JOINED_RANGES = 4
+# a block is decoded as a stream on its own, the biggest block size always fits
+STREAM_HEADER = b'BZh9'
+
+
+def _magic_patterns(magic: int) -> list[tuple[int, bytes]]:
+    # for each bit shift, the bytes that are entirely covered by the magic number
+    patterns = []
+    for shift in range(8):
+        window = (magic << (8 - shift)).to_bytes(7, 'big')
+        patterns.append((shift, window[0:6] if shift == 0 else window[1:6]))
+    return patterns
+
+
+def _read_bits(data: bytes, start: int, n_bits: int) -> int:
+    first_byte = start // 8
+    last_byte = (start + n_bits + 7) // 8
+    value = int.from_bytes(data[first_byte:last_byte], 'big')
+    trailing = last_byte * 8 - (start + n_bits)
+    return (value >> trailing) & ((1 << n_bits) - 1)
+
+
+def _find_magic(data: mmap.mmap, magic: int) -> list[int]:
+    offsets = []
+    for shift, pattern in _magic_patterns(magic):
+        # the pattern starts one byte after the magic, unless it is byte aligned
+        lead = 0 if shift == 0 else 1
+        position = data.find(pattern, lead)
+        while position != -1:
+            start = (position - lead) * 8 + shift
+            if start + MAGIC_BITS <= len(data) * 8 and _read_bits(data, start, MAGIC_BITS) == magic:
+                offsets.append(start)
+            position = data.find(pattern, position + 1)
+    return offsets
+
+
+def find_blocks(path: Path) -> list[tuple[int, int]]:
+    # returns the bit ranges of the blocks, each one from its magic to the next magic
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if data[:3] != b'BZh':
+            raise Exception(f'{path} is not a bzip2 file')
+        blocks = [(offset, True) for offset in _find_magic(data, BLOCK_MAGIC)]
+        ends = [(offset, False) for offset in _find_magic(data, EOS_MAGIC)]
+    magics = sorted(blocks + ends)
+    return [
+        (offset, magics[index + 1][0])
+        for index, (offset, is_block) in enumerate(magics)
+        if is_block and index + 1 < len(magics)
+    ]
+
+
+def decompress_block(path: Path, start: int, end: int) -> bytes:
+    with open(path, 'rb') as file:
+        file.seek(start // 8)
+        data = file.read((end + 7) // 8 - start // 8)
+    start_in_data = start % 8
+    n_bits = end - start
+    block = _read_bits(data, start_in_data, n_bits)
+    # the stream crc of a stream with a single block is the crc of the block
+    crc = _read_bits(data, start_in_data + MAGIC_BITS, CRC_BITS)
+    stream = (((block << MAGIC_BITS) | EOS_MAGIC) << CRC_BITS) | crc
+    stream_bits = n_bits + MAGIC_BITS + CRC_BITS
+    padding = -stream_bits % 8
+    return bz2.decompress(STREAM_HEADER + (stream << padding).to_bytes((stream_bits + padding) // 8, 'big'))
+
+
+# Reads the lines of a bz2 file decompressing its blocks in parallel processes.
+# It can be used in place of the file object returned by bz2.open in text mode:
+# lines are yielded in order, with universal newlines, also if split between blocks.
+class Bz2BlockReader:
+
+    def __decompressed_blocks(self) -> Iterator[bytes]:
+        # only a bounded window of blocks is decompressed ahead of the reader
+        pending = deque(self.blocks)
+        window = deque()
+        joined = 0
+        while pending or window:
+            while pending and len(window) < 2 * self.processes:
+                start, end = pending.popleft()
+                window.append((start, end, self.executor.submit(decompress_block, self.path, start, end)))
+            start, end, future = window.popleft()
+            try:
+                data = future.result()
+            except (OSError, ValueError) as err:
+                # a magic number can also appear inside the compressed data, splitting a block in two:
+                # the range is joined with the next one, a few times at most since the data could be corrupted
+                if joined >= MAX_JOINED_RANGES or not (pending or window):
+                    raise Exception(f'{self.path} cannot be decompressed from bit {start}') from err
+                if window:
+                    _, end, next_future = window.popleft()
+                    next_future.cancel()
+                else:
+                    _, end = pending.popleft()
+                joined += 1
+                log.warn(f'Block at bit {start} cannot be decompressed, joining it with the next one', asset=self.path.name, scope='Bz2BlockReader')
+                window.appendleft((start, end, self.executor.submit(decompress_block, self.path, start, end)))
+                continue
+            joined = 0
+            yield data
+
+    def __lines(self) -> Iterator[Union[str, bytes]]:
+        # without an encoding the lines are yielded as bytes
+        empty, lf, cr, crlf = (b'', b'\n', b'\r', b'\r\n') if self.encoding is None else ('', '\n', '\r', '\r\n')
+        pending = empty
+        for data in self.__decompressed_blocks():
+            text = pending + (data if self.encoding is None else data.decode(self.encoding))
+            # a final \r could be the start of a \r\n split between two blocks
+            held = cr if text.endswith(cr) else empty
+            if held:
+                text = text[:-1]
+            lines = text.replace(crlf, lf).replace(cr, lf).split(lf)
+            pending = lines.pop() + held
+            for line in lines:
+                yield line + lf
+        lines = pending.replace(crlf, lf).replace(cr, lf).split(lf)
+        last = lines.pop()
+        for line in lines:
+            yield line + lf
+        if last:
+            yield last
+
+    def __init__(self, path: Path, processes: int, encoding: Optional[str]):
+        self.path = path
+        self.processes = processes
+        self.encoding = encoding
+        self.blocks = find_blocks(path)
+        self.executor = ProcessPoolExecutor(max_workers=processes)
+        self.lines = self.__lines()
+
+    def __enter__(self) -> 'Bz2BlockReader':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __iter__(self) -> 'Bz2BlockReader':
+        return self
+
+    def __next__(self) -> Union[str, bytes]:
+        return next(self.lines)
+
+    def close(self) -> None:
+        self.lines.close()
+        self.executor.shutdown(cancel_futures=True)
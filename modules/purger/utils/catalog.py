@@ -0,0 +1,90 @@
+import hashlib
+import os
+from json import dumps, loads
+from pathlib import Path
+from typing import Optional
+
+from ...utils.codecs import detect_codec
+from .bz2blocks import find_blocks
+
+# bytes hashed at a time
+HASH_CHUNK = 2**20
+
+
+def content_hash(path: Path) -> str:
+    digest = hashlib.blake2b()
+    with open(path, 'rb') as asset:
+        for chunk in iter(lambda: asset.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# What is known about each purged asset of a language: its fingerprint, the
+# index that gave its bias and the range of line fields it occupies, so that a
+# changed asset can be replaced without purging again the whole language.
+class Catalog:
+
+    def __path(self, asset_name: str) -> Path:
+        return self.catalog_dir.joinpath(f'{asset_name}.json')
+
+    def __write(self, asset_name: str, entry: dict) -> None:
+        self.catalog_dir.mkdir(parents=True, exist_ok=True)
+        path = self.__path(asset_name)
+        temp_path = path.with_name(path.name + '.tmp')
+        with open(temp_path, 'w') as entry_file:
+            entry_file.write(dumps(entry))
+        os.replace(temp_path, path)
+
+    def __init__(self, catalog_dir: str, dbname: str, language: str):
+        self.catalog_dir = Path(catalog_dir).joinpath(dbname, language)
+
+    def load(self, asset_name: str) -> Optional[dict]:
+        path = self.__path(asset_name)
+        if not path.is_file():
+            return None
+        with open(path) as entry_file:
+            return loads(entry_file.read())
+
+    def entries(self) -> dict[str, dict]:
+        if not self.catalog_dir.is_dir():
+            return {}
+        return {path.name[:-len('.json')]: self.load(path.name[:-len('.json')]) for path in self.catalog_dir.glob('*.json')}
+
+    def is_unchanged(self, asset: Path) -> bool:
+        entry = self.load(asset.name)
+        if entry is None:
+            return False
+        stat = asset.stat()
+        if entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return True
+        # a file touched but not modified keeps its profiles, its new mtime is recorded
+        if entry['size'] == stat.st_size and entry['hash'] == content_hash(asset):
+            entry['mtime'] = stat.st_mtime
+            self.__write(asset.name, entry)
+            return True
+        return False
+
+    def record(self, asset: Path, index: int, first_line: int, lines: int) -> None:
+        stat = asset.stat()
+        self.__write(asset.name, {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'hash': content_hash(asset),
+            'index': index,
+            'lines': lines,
+            'first_line': first_line,
+            'last_line': first_line + lines - 1,
+            # bit ranges of the blocks, to decompress any part of the asset without reading the previous ones
+            'blocks': find_blocks(asset) if detect_codec(asset) == 'bz2' else None
+        })
+
+    def remove(self, asset_name: str) -> None:
+        path = self.__path(asset_name)
+        if path.is_file():
+            path.unlink()
+
+    def clear(self) -> None:
+        # the entries of a dropped collection would give the lines of other assets
+        if self.catalog_dir.is_dir():
+            for path in self.catalog_dir.glob('*.json'):
+                path.unlink()
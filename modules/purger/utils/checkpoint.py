@@ -0,0 +1,37 @@
+import os
+from json import dumps, loads
+from pathlib import Path
+from typing import Optional
+
+
+class Checkpoint:
+
+    def __init__(self, checkpoints_dir: str, dbname: str, language: str, asset: str):
+        self.path = Path(checkpoints_dir).joinpath(dbname, language, f'{asset}.json')
+
+    def load(self) -> Optional[dict]:
+        if not self.path.is_file():
+            return None
+        with open(self.path) as checkpoint_file:
+            return loads(checkpoint_file.read())
+
+    def __write(self, state: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # written on a temporary file and renamed, so that a crash never leaves it truncated
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w') as checkpoint_file:
+            checkpoint_file.write(dumps(state))
+        os.replace(temp_path, self.path)
+
+    def save(self, line: int, position: int) -> None:
+        # line is the last committed line field, position the number of input lines consumed up to it
+        self.__write({'line': line, 'position': position, 'done': False})
+
+    def finish(self) -> None:
+        state = self.load() or {'line': None, 'position': 0}
+        state['done'] = True
+        self.__write(state)
+
+    def clear(self) -> None:
+        if self.path.is_file():
+            self.path.unlink()
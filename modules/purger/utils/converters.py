@@ -0,0 +1,67 @@
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable
+
+from ...utils import logger as log
+
+ENCODING = 'ISO-8859-1'
+# distinct date and datetime values remembered by each process
+DATES_CACHE_SIZE = 2**16
+
+
+@lru_cache(maxsize=DATES_CACHE_SIZE)
+def _parse_datetime(value: str) -> datetime:
+    return datetime.strptime(value, "%m/%d/%Y %H:%M:%S %p")
+
+
+@lru_cache(maxsize=DATES_CACHE_SIZE)
+def _parse_date(value: str) -> datetime:
+    parts = value.split('/')
+    month = int(parts[0])
+    day = int(parts[1])
+    try:
+        year = int(parts[2])
+    except Exception:
+        # It has to be bisestile or it raises an error for 29/02 :)
+        year = 12
+    try:
+        result = datetime(year, month, day)
+    except ValueError as error:
+        log.err(f'Invalid date: {value}', scope='Parser')
+        raise error
+    return result
+
+
+# regexps whose values are ascii digits, int converts them the same as bytes or as str
+ASCII_NUMBERS = ['numeric', 'phone']
+# expression converting the non empty value v of each type
+CONVERSIONS = {
+    'string': '{v}',
+    'number': 'int({v})',
+    'datetime': '_parse_datetime({v})',
+    'date': '_parse_date({v})'
+}
+
+
+def compile_converter(schema: dict, lang: str, asset: str, binary: bool = False) -> Callable[[dict, int], dict]:
+    # generates a function converting the matched values of a line, with a line for each kept prop,
+    # if binary the values are bytes and only the kept ones are decoded
+    props = [(prop, details['type']) for prop, details in schema['props'].items() if details['keep']]
+    decoded = {
+        prop: binary and not (details['type'] == 'number' and details['regex'] in ASCII_NUMBERS)
+        for prop, details in schema['props'].items()
+    }
+    for prop, vtype in props:
+        if vtype not in CONVERSIONS:
+            log.warn(f'Unrecognized type {vtype}', lang=lang, asset=asset)
+    lines = ['def convert(matched, index):']
+    for position, (prop, vtype) in enumerate(props):
+        value = f'v{position}'
+        conversion = CONVERSIONS.get(vtype, 'None').format(v=value)
+        lines.append(f'    {value} = matched[{prop!r}]' + (f'.decode({ENCODING!r})' if decoded[prop] else ''))
+        lines.append(f'    {value} = {conversion} if {value} else None')
+    fields = ', '.join(f'{prop!r}: v{position}' for position, (prop, _) in enumerate(props))
+    lines.append(f"    return {{{fields}, 'line': index}}" if fields else "    return {'line': index}")
+    namespace = {'_parse_datetime': _parse_datetime, '_parse_date': _parse_date}
+    exec('\n'.join(lines), namespace)
+    return namespace['convert']
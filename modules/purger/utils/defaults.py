@@ -14,3 +14,22 @@ DEFAULT_NAZI = False
 DEFAULT_SKIP_FIRST_LINE = False
 DEFAULT_WIDE = False
 DEFAULT_JUMP_LINES = 0
+DEFAULT_LINEAR = False
+DEFAULT_BLOCK_PROCESSES = 0
+DEFAULT_SHARDS = 0
+DEFAULT_WRITERS = 0
+DEFAULT_BATCH_BYTES = 0
+DEFAULT_UNORDERED = False
+DEFAULT_RAW_BSON = False
+DEFAULT_RESUME = False
+DEFAULT_CHECKPOINTS = '.checkpoints'
+DEFAULT_BULK_LOAD = False
+DEFAULT_SINK = 'mongo'
+DEFAULT_OUT_DIR = 'dump'
+DEFAULT_QUARANTINE = None
+DEFAULT_QUARANTINE_DIR = 'quarantine'
+DEFAULT_METRICS_DIR = None
+DEFAULT_METRICS_INTERVAL = 10
+DEFAULT_INCREMENTAL = False
+DEFAULT_CATALOG = '.catalog'
+DEFAULT_BINARY = False
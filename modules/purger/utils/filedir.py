@@ -1,6 +1,7 @@
 from pathlib import Path
 
 from ...utils import logger as log
+from ...utils.codecs import COMPRESSED_SUFFIXES
 
 
 class FileDir:
@@ -47,7 +48,7 @@ class FileDir:
     def retrieve_lang_assets(self, lang: str, wide: bool) -> list[Path]:
         lang_obj = self.__get_lang_obj_from_lang(lang)
         lang_path = lang_obj['path']
-        return sorted([file for file in lang_path.iterdir() if file.is_file() and file.suffix in (['.bz2', '.txt'] if wide else ['.bz2'])], key=lambda f: f.name)
+        return sorted([file for file in lang_path.iterdir() if file.is_file() and file.suffix in (COMPRESSED_SUFFIXES + ['.txt'] if wide else COMPRESSED_SUFFIXES)], key=lambda f: f.name)
 
     def retrieve_lang_fullname(self, lang: str) -> list[Path]:
         lang_obj = self.__get_lang_obj_from_lang(lang)
@@ -1,40 +1,24 @@
 import re
-from pathlib import Path
-from json import loads
-from datetime import datetime
-from typing import Optional
+from typing import Optional, Union
 
 from ...utils import logger as log
+from ...utils import metrics
 from ...utils.timeout import timeout
+from .regexps import REGEXPS, LINEAR_REGEXPS, ATOMIC_BEFORE
+from .tokenizer import Tokenizer
+from .schemas import fetch_schema
+from .converters import compile_converter
+from .quarantine import Quarantine
 
-# regexps to parse the lines
-REGEXPS = {
-    'numeric': r'(?:[\d])',
-    'phone': r'(?:[\+\d])',
-    'char': r'(?:[A-Za-z])',
-    'uchar': r'(?:[\p{L}\p{M}*])',
-    'whole': r'(?:[^:])',
-    'whole_comma': r'(?:[^,])',
-    'whole_dbquotes': r'(?:[^"])',
-    'total_whole': r'(?:.?)',
-    'place_comma': r'(?:[^,]+(?:, [^,]+)?(?:, [^,]+)?)',
-    'datetime': r'(?:\d{1,2}\/\d{1,2}\/\d{1,4} \d{1,2}:\d{1,2}:\d{1,2} (?:AM|PM))',
-    'datetime_de': r'(?:\d{1,2}\/\d{1,2}\/\d{1,4} \d{1,2},\d{1,2},\d{1,2} (?:AM|PM))',
-    'date': r'(?:(?:\d{1,2})(?:\/\d{1,2})?(?:\/\d{1,4})?)',
-    'location_divider': r'(?:Location\*)',
-    'link_divider': r'(?:link\*)'
-}
 # if more than n subsequent lines fail, something is not working
 MAX_FAILURES = 10
+# a failed line is joined at most with this number of previous failed lines, the older ones are rejected
+MAX_JOINED_LINES = 2
+# binary lines are matched as bytes, each byte is the char of the same code
+ENCODING = 'ISO-8859-1'
 
 
 class Parser:
-    def __fetch_schemas(self, lang: str) -> dict:
-        with open(Path(__file__).parent.joinpath('schemas.json').absolute()) as schemas_file:
-            text = schemas_file.read()
-            schemas = loads(text)
-            return schemas[lang] if lang in schemas else schemas['default']
-
     def __regex_from_details(self, details: dict) -> str:
         body = REGEXPS[details['regex']]
         multiplier = '*' if details['optional'] else '+'
@@ -49,97 +33,128 @@ class Parser:
             for prop, details in props.items()
         ]) + '$'
 
-    def __parse_value(self, value: str, vtype: str):
-        if not value:
-            return None
-        if vtype == 'string':
-            return value
-        if vtype == 'number':
-            return int(value)
-        if vtype == 'datetime':
-            return datetime.strptime(value, "%m/%d/%Y %H:%M:%S %p")
-        if vtype == 'date':
-            parts = value.split('/')
-            month = int(parts[0])
-            day = int(parts[1])
-            try:
-                year = int(parts[2])
-            except Exception:
-                # It has to be bisestile or it raises an error for 29/02 :)
-                year = 12
-            try:
-                result = datetime(year, month, day)
-            except ValueError as error:
-                log.err(f'Invalid date: {value}', scope='Parser')
-                raise error
-            return result
-        log.warn(f'Unrecognized type {vtype}',
-                 lang=self.lang, asset=self.asset)
-
-    def __parse_matched(self, matched: dict, index: int) -> dict:
-        result = {
-            prop: self.__parse_value(matched[prop], details['type'])
-            for prop, details in self.schema['props'].items()
-            if details['keep']
-        }
-        result['line'] = index
-        return result
+    def __linear_regex_from_details(self, prop: str, details: dict, follower: Optional[str]) -> str:
+        body = LINEAR_REGEXPS[details['regex']]
+        if details['optional']:
+            body = rf'(?:{body})?'
+        if follower is None or follower in ATOMIC_BEFORE[details['regex']]:
+            # a lookahead is atomic: capturing in it and consuming with a backreference
+            # works as an atomic group, which is never backtracked into
+            return rf'(?=(?P<{prop}>{body}))(?P={prop})'
+        return rf'(?P<{prop}>{body})'
+
+    def __compute_linear_regex(self, schema: dict) -> str:
+        props = list(schema['props'].items())
+        separator = schema['separator']
+        attornator = schema['attornator']
+        # the char after each value, None if it is the end of the line
+        followers = [attornator or separator] * (len(props) - 1) + [attornator or None]
+        return '^' + separator.join([
+            rf'{attornator}{self.__linear_regex_from_details(prop, details, follower)}{attornator}'
+            for (prop, details), follower in zip(props, followers)
+        ]) + '$'
 
     @timeout(2)
-    def __check_line_mach(self, line: str):
-        return re.match(self.regex, line)
+    def __check_line_mach(self, line: Union[str, bytes]):
+        return self.pattern.match(line)
+
+    def __text(self, line: Union[str, bytes]) -> str:
+        return line.decode(ENCODING) if self.binary else line
 
-    def __parse_line(self, line: str) -> Optional[dict]:
+    def __parse_line(self, line: Union[str, bytes]) -> Optional[dict]:
+        if self.tokenizer:
+            tokenized = self.tokenizer.tokenize(line)
+            if tokenized is not None:
+                return tokenized
         try:
-            matched = self.__check_line_mach(line)
+            # the linear regex cannot backtrack catastrophically, no timeout is needed
+            matched = self.pattern.match(line) if self.linear else self.__check_line_mach(line)
             return None if matched is None else matched.groupdict()
         except Exception:
             return None
 
-    def __init__(self, lang: str, asset: str, nazi: bool):
+    def __init__(self, lang: str, asset: str, nazi: bool, linear: bool = False, quarantine: Optional[Quarantine] = None, binary: bool = False):
         self.lang = lang
         self.asset = asset
         self.nazi = nazi
-
-        self.schema = self.__fetch_schemas(lang)
-        self.regex = self.__compute_regex(self.schema)
-
-        self.failed_line = None
+        # binary lines are bytes, only the values of the kept props are decoded
+        self.binary = binary
+        self.empty = b'' if binary else ''
+
+        self.schema = fetch_schema(lang)
+        # props without a linear regexp still need the backtracking regex and its timeout
+        self.linear = linear and all(LINEAR_REGEXPS[details['regex']] is not None for details in self.schema['props'].values())
+        if linear and not self.linear:
+            log.warn('Schema cannot be matched in linear time, using the regex with timeout', lang=self.lang, asset=self.asset)
+        self.regex = self.__compute_linear_regex(self.schema) if self.linear else self.__compute_regex(self.schema)
+        self.pattern = re.compile(self.regex.encode(ENCODING) if binary else self.regex)
+        # the tokenizer is a fast path, the regex remains the fallback for ambiguous lines
+        self.tokenizer = Tokenizer(self.schema, binary) if self.schema.get('tokenizer', False) else None
+        # the matched values are converted by a function generated for the schema
+        self.convert = compile_converter(self.schema, lang, asset, binary)
+
+        # the last failed lines, with their index, that could still be joined with the next ones
+        self.failed_lines = []
         self.subseq_failures = 0
+        self.quarantine = quarantine
 
         log.debug(self.regex, lang=self.lang, asset=self.asset, scope='Parser')
 
-    def parse_line(self, index: int, line: str) -> Optional[dict]:
+    def __reject_failed_lines(self, n_lines: int) -> None:
+        if n_lines:
+            metrics.add('lines_failed', n_lines, self.lang)
+        for failed_index, failed_line in self.failed_lines[:n_lines]:
+            if self.quarantine:
+                self.quarantine.add(failed_index, self.__text(failed_line))
+        self.failed_lines = self.failed_lines[n_lines:]
+
+    def match(self, line: Union[str, bytes]) -> Optional[dict]:
+        # the values of a single line, without joining the failed lines or converting them
+        return self.__parse_line(line)
+
+    def parse_line(self, index: int, line: Union[str, bytes]) -> Optional[dict]:
         extracted = self.__parse_line(line)
 
         if extracted is None:
-            if self.failed_line:
-                whole_line = self.failed_line + line
+            # a line split in more lines, joined with the last failed ones only, the longest join first
+            for start in range(len(self.failed_lines)):
+                whole_line = self.empty.join(failed_line for _, failed_line in self.failed_lines[start:]) + line
                 extracted = self.__parse_line(whole_line)
-                self.failed_line = whole_line if extracted is None else None
-                self.subseq_failures = self.subseq_failures + 1 if extracted is None else 0
-            else:
-                self.failed_line = line
+                if extracted is not None:
+                    metrics.add('lines_joined', len(self.failed_lines) - start, self.lang)
+                    self.__reject_failed_lines(start)
+                    break
+            if extracted is None:
+                self.failed_lines.append((index, line))
                 self.subseq_failures += 1
+                if len(self.failed_lines) > MAX_JOINED_LINES:
+                    self.__reject_failed_lines(len(self.failed_lines) - MAX_JOINED_LINES)
+            else:
+                self.failed_lines = []
+                self.subseq_failures = 0
             if self.subseq_failures > MAX_FAILURES:
                 if self.nazi:
                     txt = f'Too many lines failed ({self.subseq_failures}), index was {index}'
-                    log.warn(self.failed_line + line, lang=self.lang, asset=self.asset)
+                    log.warn(''.join(self.__text(failed_line) for _, failed_line in self.failed_lines), lang=self.lang, asset=self.asset)
                     log.err(txt, lang=self.lang, asset=self.asset)
                     raise Exception(txt)
                 else:
                     log.warn(f'{self.subseq_failures} subsequent failures, file is probably nonsense, index is {index}',
                              lang=self.lang, asset=self.asset)
                     self.subseq_failures = 0
-                    self.failed_line = None
-        elif self.failed_line:
+                    self.__reject_failed_lines(len(self.failed_lines))
+        elif self.failed_lines:
             txt = f'Failed parsing line at (biased) index {index - 1}'
             if self.nazi:
-                log.warn(self.failed_line, lang=self.lang, asset=self.asset)
+                log.warn(''.join(self.__text(failed_line) for _, failed_line in self.failed_lines), lang=self.lang, asset=self.asset)
                 log.err(txt, lang=self.lang, asset=self.asset)
                 raise Exception(txt)
             else:
                 log.warn(txt, lang=self.lang, asset=self.asset)
-            self.failed_line = None
+            self.__reject_failed_lines(len(self.failed_lines))
+
+        return None if extracted is None else self.convert(extracted, index)
 
-        return None if extracted is None else self.__parse_matched(extracted, index)
+    def close(self) -> None:
+        # the failed lines at the end of the asset are rejected too
+        self.__reject_failed_lines(len(self.failed_lines))
@@ -0,0 +1,70 @@
+import gzip
+import threading
+from json import dumps, loads
+from pathlib import Path
+from queue import Queue
+from typing import Iterator
+
+# rejected lines waiting to be written, when full the parser waits
+QUEUE_SIZE = 10000
+EXTENSION = '.quarantine.ndjson.gz'
+
+
+def quarantine_path(quarantine_dir: str, language: str, asset: str) -> Path:
+    return Path(quarantine_dir).joinpath(language, f'{asset}{EXTENSION}')
+
+
+def iter_quarantine(path: Path) -> Iterator[dict]:
+    with gzip.open(path, 'rt', encoding='utf-8') as quarantine_file:
+        for record in quarantine_file:
+            yield loads(record)
+
+
+# Writes the rejected lines of an asset on a gzipped side file, a json record
+# for each line, from a background thread so that the parser is not slowed down.
+class Quarantine:
+
+    def __write_queued_records(self) -> None:
+        try:
+            with gzip.open(self.temp_path, 'wt', encoding='utf-8') as quarantine_file:
+                while True:
+                    record = self.queue.get()
+                    if record is None:
+                        return
+                    quarantine_file.write(dumps(record) + '\n')
+                    self.rejected += 1
+        except Exception as err:
+            self.error = err
+            # the records are only drained, so that the parser is not blocked
+            while self.queue.get() is not None:
+                pass
+
+    def __init__(self, path: Path, lang: str, language: str, asset: str):
+        self.path = path
+        self.temp_path = path.with_name(path.name + '.tmp')
+        self.lang = lang
+        self.language = language
+        self.asset = asset
+        self.rejected = 0
+        self.error = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.queue = Queue(maxsize=QUEUE_SIZE)
+        self.thread = threading.Thread(target=self.__write_queued_records, daemon=True)
+        self.thread.start()
+
+    def add(self, index: int, line: str) -> None:
+        self.queue.put({'lang': self.lang, 'language': self.language, 'asset': self.asset, 'line': index, 'text': line})
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        # an asset without rejected lines leaves no file
+        if self.rejected:
+            self.temp_path.replace(self.path)
+        else:
+            self.temp_path.unlink()
+            if self.path.is_file():
+                self.path.unlink()
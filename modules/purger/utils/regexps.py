@@ -0,0 +1,71 @@
+# regexps to parse the lines
+REGEXPS = {
+    'numeric': r'(?:[\d])',
+    'phone': r'(?:[\+\d])',
+    'char': r'(?:[A-Za-z])',
+    'uchar': r'(?:[\p{L}\p{M}*])',
+    'whole': r'(?:[^:])',
+    'whole_comma': r'(?:[^,])',
+    'whole_dbquotes': r'(?:[^"])',
+    'total_whole': r'(?:.?)',
+    'place_comma': r'(?:[^,]+(?:, [^,]+)?(?:, [^,]+)?)',
+    'datetime': r'(?:\d{1,2}\/\d{1,2}\/\d{1,4} \d{1,2}:\d{1,2}:\d{1,2} (?:AM|PM))',
+    'datetime_de': r'(?:\d{1,2}\/\d{1,2}\/\d{1,4} \d{1,2},\d{1,2},\d{1,2} (?:AM|PM))',
+    'date': r'(?:(?:\d{1,2})(?:\/\d{1,2})?(?:\/\d{1,4})?)',
+    'location_divider': r'(?:Location\*)',
+    'link_divider': r'(?:link\*)'
+}
+# chars that never appear in the values matched by each regexp
+EXCLUDED_CHARS = {
+    'numeric': ':,"',
+    'phone': ':,"',
+    'char': ':,"',
+    'uchar': '',
+    'whole': ':',
+    'whole_comma': ',',
+    'whole_dbquotes': '"',
+    'total_whole': '',
+    'place_comma': ':"',
+    'datetime': ',"',
+    'datetime_de': ':"',
+    'date': ':,"',
+    'location_divider': ':,"',
+    'link_divider': ':,"'
+}
+# regexps equivalent to the ones above, already repeated at least once (same as
+# appending "+"), but without nested quantifiers that backtrack exponentially.
+# None if there is no equivalent regexp that would match the same values
+LINEAR_REGEXPS = {
+    'numeric': r'[\d]+',
+    'phone': r'[\+\d]+',
+    'char': r'[A-Za-z]+',
+    'uchar': r'[\p{L}\p{M}*]+',
+    'whole': r'[^:]+',
+    'whole_comma': r'[^,]+',
+    'whole_dbquotes': r'[^"]+',
+    'total_whole': r'.*',
+    'place_comma': None,
+    'datetime': r'(?:\d{1,2}\/\d{1,2}\/\d{1,4} \d{1,2}:\d{1,2}:\d{1,2} (?:AM|PM))+',
+    'datetime_de': r'(?:\d{1,2}\/\d{1,2}\/\d{1,4} \d{1,2},\d{1,2},\d{1,2} (?:AM|PM))+',
+    'date': r'\d+(?:\/(?!\d\/\d\/)\d+)*',
+    'location_divider': r'(?:Location\*)+',
+    'link_divider': r'(?:link\*)+'
+}
+# chars that, if following a value of each regexp, make the value unique: such values
+# can be matched atomically, since backtracking could never find a different one
+ATOMIC_BEFORE = {
+    'numeric': ':,"',
+    'phone': ':,"',
+    'char': ':,"',
+    'uchar': '',
+    'whole': ':',
+    'whole_comma': ',',
+    'whole_dbquotes': '"',
+    'total_whole': '',
+    'place_comma': '',
+    'datetime': ':,"',
+    'datetime_de': ':,"',
+    'date': ':,"',
+    'location_divider': ':,"',
+    'link_divider': ':,"'
+}
@@ -0,0 +1,16 @@
+from functools import lru_cache
+from json import loads
+from pathlib import Path
+
+
+@lru_cache(maxsize=None)
+def _load_schemas() -> dict:
+    # read once per process, the schemas are never modified
+    with open(Path(__file__).parent.joinpath('schemas.json').absolute()) as schemas_file:
+        text = schemas_file.read()
+        return loads(text)
+
+
+def fetch_schema(lang: str) -> dict:
+    schemas = _load_schemas()
+    return schemas[lang] if lang in schemas else schemas['default']
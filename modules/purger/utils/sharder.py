@@ -0,0 +1,111 @@
+import mmap
+import os
+from itertools import chain
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+from ...utils.codecs import open_codec
+
+# decompressed bytes split at once into lines by the binary reader
+READ_CHUNK = 2**20
+# bytes scanned at once while counting line breaks
+COUNT_WINDOW = 64 * 2**20
+
+
+def compute_shards(path: Path, n_shards: int) -> list[tuple[int, int]]:
+    # byte ranges of about the same size, each one starting at the beginning of a line
+    with open(path, 'rb') as file:
+        size = file.seek(0, 2)
+        if size == 0:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            bounds = [0]
+            for index in range(1, n_shards):
+                position = data.find(b'\n', max(size * index // n_shards, bounds[-1]))
+                if position == -1 or position + 1 == size:
+                    break
+                bounds.append(position + 1)
+            bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def count_line_breaks(path: Path, start: int, end: int) -> int:
+    # counts \n, \r\n and \r as a single line break each, as universal newlines do
+    count = 0
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for position in range(start, end, COUNT_WINDOW):
+            window_end = min(position + COUNT_WINDOW, end)
+            window = data[position:window_end]
+            count += window.count(b'\n') + window.count(b'\r') - window.count(b'\r\n')
+            # a \r\n split between two windows
+            if window.endswith(b'\r') and window_end < end and data[window_end:window_end + 1] == b'\n':
+                count -= 1
+    return count
+
+
+def ends_with_line_break(path: Path) -> bool:
+    # an empty asset has no unterminated last line either
+    with open(path, 'rb') as file:
+        if file.seek(0, os.SEEK_END) == 0:
+            return True
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) in (b'\n', b'\r')
+
+
+def universal_lines(lines: Iterable[bytes]) -> Iterator[bytes]:
+    # splits the lines read in binary mode also on \r\n and \r, as a file opened in text mode would
+    for line in lines:
+        if b'\r' not in line:
+            yield line
+            continue
+        parts = line.replace(b'\r\n', b'\n').replace(b'\r', b'\n').split(b'\n')
+        last = parts.pop()
+        for part in parts:
+            yield part + b'\n'
+        if last:
+            yield last
+
+
+# Reads the lines of a whole asset as bytes, split as a file opened in text mode
+# would split them. The asset is read in chunks split all at once, so that
+# iterating over the lines does not run python code for each line.
+class BinaryLineReader:
+
+    def __chunk_lines(self) -> Iterator[list[bytes]]:
+        pending = b''
+        for chunk in iter(lambda: self.file.read(READ_CHUNK), b''):
+            # bytes are split only on \n, \r\n and \r, the line breaks are kept
+            lines = (pending + chunk).splitlines(True)
+            # the last line can continue in the next chunk, also a final \r can be the start of a \r\n
+            pending = lines.pop()
+            yield lines
+        if pending:
+            yield [pending]
+
+    def __init__(self, path: Path, codec: str):
+        self.file = open_codec(path, 'rb', codec)
+        self.lines = chain.from_iterable(self.__chunk_lines())
+
+    def __enter__(self) -> 'BinaryLineReader':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self.lines
+
+    def __next__(self) -> bytes:
+        return next(self.lines)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def iter_shard_lines(path: Path, start: int, end: int, encoding: Optional[str]) -> Iterator[Union[str, bytes]]:
+    # yields the lines of a shard as a file opened in text mode would, as bytes if there is no encoding
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        data.seek(start)
+        raw_lines = iter(lambda: data.readline() if data.tell() < end else b'', b'')
+        for line in universal_lines(raw_lines):
+            yield line if encoding is None else line.decode(encoding)
@@ -0,0 +1,159 @@
+import gzip
+import time
+from abc import ABC, abstractmethod
+from json import dumps
+from pathlib import Path
+from typing import Callable, Optional
+from bson import encode
+from bson.json_util import JSONOptions, JSONMode
+from bson.json_util import dumps as json_dumps
+
+from ...utils import logger as log
+from ...utils import metrics
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# extended json understood by mongoimport
+NDJSON_OPTIONS = JSONOptions(json_mode=JSONMode.RELAXED)
+# metadata read by mongorestore next to the bson file, with the unique line index
+BSON_METADATA = {
+    'options': {},
+    'indexes': [
+        {'v': 2, 'key': {'_id': 1}, 'name': '_id_'},
+        {'v': 2, 'key': {'line': 1}, 'name': 'lineIndex', 'unique': True}
+    ]
+}
+
+
+# Base of the sinks writing the profiles of an asset on a file instead of MongoDB.
+# They are used by Uploader in place of BulkWriter, with the same methods.
+class FileSink(ABC):
+    extension = ''
+
+    def _open(self) -> None:
+        self.file = open(self.path, 'wb')
+
+    @abstractmethod
+    def _write(self, batch: list) -> None:
+        pass
+
+    def _close(self) -> None:
+        self.file.close()
+
+    def __init__(self, out_dir: str, dbname: str, language: str, asset: str, threshold: int, on_commit: Optional[Callable] = None):
+        self.path = Path(out_dir).joinpath(dbname, language, f'{asset}{self.extension}')
+        self.language = language
+        self.asset = asset
+        self.threshold = threshold
+        self.on_commit = on_commit
+        self.file = None
+        self.buffer = []
+        self.buffer_mark = None
+        self.inserted = 0
+
+    def exists(self) -> bool:
+        return self.path.is_file()
+
+    def remove(self) -> None:
+        self.path.unlink()
+
+    def append(self, document: dict, mark=None) -> None:
+        self.buffer_mark = mark
+        self.buffer.append(document)
+        if len(self.buffer) == self.threshold:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._open()
+        if self.buffer:
+            start = time.perf_counter()
+            self._write(self.buffer)
+            metrics.add('seconds_insert', time.perf_counter() - start, self.language)
+            metrics.add('profiles_uploaded', len(self.buffer), self.language)
+            self.inserted += len(self.buffer)
+            self.buffer = []
+            log.debug(f'Written {self.inserted} elements on {self.path}',
+                      lang=self.language, asset=self.asset)
+            if self.buffer_mark is not None and self.on_commit:
+                self.on_commit(self.buffer_mark)
+
+    def close(self) -> None:
+        self.buffer = []
+        if self.file is not None:
+            self._close()
+            self.file = None
+
+
+# Concatenated BSON documents, as written by mongodump, restorable with
+# mongorestore --db <dbname> --collection <language> <file>
+class BsonSink(FileSink):
+    extension = '.bson'
+
+    def _write(self, batch: list) -> None:
+        self.file.write(b''.join(encode(document) for document in batch))
+
+    def _close(self) -> None:
+        self.file.close()
+        metadata_path = self.path.with_name(self.path.name.replace('.bson', '.metadata.json'))
+        with open(metadata_path, 'w') as metadata_file:
+            metadata_file.write(dumps({**BSON_METADATA, 'collectionName': self.language}))
+
+
+# A document per line in extended json, gzip compressed, importable with mongoimport
+class NdjsonSink(FileSink):
+    extension = '.ndjson.gz'
+
+    def _open(self) -> None:
+        self.file = gzip.open(self.path, 'wt', encoding='utf-8')
+
+    def _write(self, batch: list) -> None:
+        self.file.write(''.join(json_dumps(document, json_options=NDJSON_OPTIONS) + '\n' for document in batch))
+
+
+# A column for each kept prop of the schema, a row group for each flush
+class ParquetSink(FileSink):
+    extension = '.parquet'
+    types = {
+        'number': 'int64',
+        'string': 'string',
+        'date': 'timestamp[ms]',
+        'datetime': 'timestamp[ms]'
+    }
+
+    def _open(self) -> None:
+        self.file = pyarrow.parquet.ParquetWriter(self.path, self.table_schema)
+
+    def _write(self, batch: list) -> None:
+        columns = {
+            name: [document.get(name) for document in batch]
+            for name in self.table_schema.names
+        }
+        self.file.write_table(pyarrow.table(columns, schema=self.table_schema))
+
+    def __init__(self, out_dir: str, dbname: str, language: str, asset: str, threshold: int, on_commit: Optional[Callable] = None, schema: Optional[dict] = None):
+        if pyarrow is None:
+            raise Exception('The parquet sink requires pyarrow, install it with pip install pyarrow')
+        super().__init__(out_dir, dbname, language, asset, threshold, on_commit)
+        fields = [
+            pyarrow.field(prop, pyarrow.type_for_alias(self.types[details['type']]))
+            for prop, details in schema['props'].items()
+            if details['keep']
+        ]
+        fields.append(pyarrow.field('line', pyarrow.int64()))
+        self.table_schema = pyarrow.schema(fields)
+
+
+def create_file_sink(sink: str, out_dir: str, dbname: str, language: str, asset: str, threshold: int, on_commit: Optional[Callable], schema: dict) -> FileSink:
+    if sink == 'bson':
+        return BsonSink(out_dir, dbname, language, asset, threshold, on_commit)
+    if sink == 'ndjson':
+        return NdjsonSink(out_dir, dbname, language, asset, threshold, on_commit)
+    if sink == 'parquet':
+        return ParquetSink(out_dir, dbname, language, asset, threshold, on_commit, schema)
+    raise Exception(f'Unknown sink {sink}')
@@ -0,0 +1,94 @@
+import re
+from typing import Callable, Optional, Union
+
+from .regexps import REGEXPS, EXCLUDED_CHARS
+
+ENCODING = 'ISO-8859-1'
+
+# regexps matching every char but the given one: if that char is the separator
+# or the attornator of the schema, splitting the line already validates them
+NEGATED_REGEXPS = {
+    'whole': ':',
+    'whole_comma': ',',
+    'whole_dbquotes': '"'
+}
+
+
+# Splits a line on the separator of the schema instead of running its whole regex.
+# If the line has exactly one value per prop and each value matches the regex of its
+# prop, every separator is a field boundary and the result equals the regex groupdict.
+# Otherwise None is returned and the caller falls back to the regex.
+class Tokenizer:
+
+    def __check_schema(self, schema: dict) -> None:
+        if len(schema['separator']) != 1 or len(schema['attornator']) > 1:
+            raise Exception('Tokenizer supports only single char separators and attornators')
+
+    def __find_wide_prop(self, schema: dict) -> Optional[int]:
+        # a prop whose values can contain the separator (e.g. a datetime with ':'),
+        # if it is the only one the props around it can still be split unambiguously
+        if self.attornator:
+            return None
+        wide = [
+            index
+            for index, details in enumerate(schema['props'].values())
+            if self.separator not in EXCLUDED_CHARS[details['regex']]
+        ]
+        return wide[0] if len(wide) == 1 else None
+
+    def __field_checker(self, details: dict) -> Optional[Callable]:
+        excluded = NEGATED_REGEXPS.get(details['regex'])
+        if excluded is not None and excluded in (self.separator, self.attornator):
+            return None if details['optional'] else bool
+        multiplier = '*' if details['optional'] else '+'
+        regex = rf'{REGEXPS[details["regex"]]}{multiplier}'
+        return re.compile(regex.encode(ENCODING) if self.binary else regex).fullmatch
+
+    def __split(self, line: Union[str, bytes]) -> list[Union[str, bytes]]:
+        if self.wide is None:
+            return line.split(self.delimiter)
+        values = line.split(self.delimiter, self.wide)
+        values[-1:] = values[-1].rsplit(self.delimiter, self.n_props - self.wide - 1)
+        return values
+
+    def __init__(self, schema: dict, binary: bool = False):
+        self.__check_schema(schema)
+
+        # a binary tokenizer splits and checks the lines as bytes, the values are not decoded
+        self.binary = binary
+        self.separator = schema['separator']
+        self.attornator = schema['attornator']
+        self.delimiter = self.attornator + self.separator + self.attornator
+        if binary:
+            self.delimiter = self.delimiter.encode(ENCODING)
+            self.quote = self.attornator.encode(ENCODING)
+        else:
+            self.quote = self.attornator
+
+        self.props = list(schema['props'].keys())
+        self.n_props = len(self.props)
+        self.wide = self.__find_wide_prop(schema)
+        self.checkers = [
+            (index, checker)
+            for index, checker in enumerate(self.__field_checker(details) for details in schema['props'].values())
+            if checker is not None
+        ]
+
+    def tokenize(self, line: Union[str, bytes]) -> Optional[dict]:
+        if self.attornator:
+            if len(line) < 2 or line[:1] != self.quote or line[-1:] != self.quote:
+                return None
+            line = line[1:-1]
+            # every attornator has to belong to a delimiter, none can be inside the values
+            if line.count(self.quote) != 2 * (self.n_props - 1):
+                return None
+
+        values = self.__split(line)
+        if len(values) != self.n_props:
+            return None
+
+        for index, checker in self.checkers:
+            if not checker(values[index]):
+                return None
+
+        return dict(zip(self.props, values))
@@ -1,9 +1,29 @@
-from pymongo import MongoClient, ASCENDING
+from typing import Callable, Optional
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
 from ...utils import logger as log
+from ...utils.bulkwriter import BulkWriter, DUPLICATE_KEY_ERROR
+from ...utils.mongo import get_database
+from .sinks import create_file_sink
+
+# conflicting lines shown when the deferred index cannot be built
+MAX_REPORTED_CONFLICTS = 10
 
 
 class Uploader:
+    def __check_file_already_exists(self, force: bool) -> None:
+        if self.writer.exists():
+            if force:
+                log.warn('Output file already exists: dropping',
+                         lang=self.language, asset=self.asset)
+                self.writer.remove()
+            else:
+                raise Exception(f'{self.writer.path} already exists')
+
     def __check_collection_already_exists(self, force: bool) -> None:
+        if self.client is None:
+            self.__check_file_already_exists(force)
+            return
         db_collections = self.database.list_collection_names()
         if self.collection.name in db_collections:
             if force:
@@ -14,22 +34,36 @@ class Uploader:
                 raise Exception(f'{self.language} already exists')
 
     def __add_unique_line_index(self) -> None:
+        # the bson sink declares the index in its metadata, the other files have none
+        if self.client is None:
+            return
         self.collection.create_index(
             [('line', ASCENDING)], name='lineIndex', unique=True)
 
-    def __init__(self, language: str, asset: str, threshold: int, dbname: str, force: bool):
-        # Open connection and get collection
-        self.client = MongoClient()
-        self.language = language
-        self.database = self.client.get_database(dbname)
-        self.collection = self.database.get_collection(language)
+    def __find_line_conflicts(self) -> list[dict]:
+        return list(self.collection.aggregate([
+            {'$group': {'_id': '$line', 'count': {'$sum': 1}}},
+            {'$match': {'count': {'$gt': 1}}}
+        ], allowDiskUse=True))
 
-        # Initialize buffer and other fields
-        self.buffer = []
+    def __init__(self, language: str, asset: str, threshold: int, dbname: str, force: bool, writers: int = 0, batch_bytes: int = 0, ordered: bool = True, raw_bson: bool = False, on_commit: Optional[Callable] = None, sink: str = 'mongo', out_dir: str = 'dump', schema: Optional[dict] = None):
+        self.language = language
         self.threshold = threshold
         self.asset = asset
         self.force = force
 
+        # File sinks take the place of the collection, with the same methods of BulkWriter
+        if sink != 'mongo':
+            self.client = None
+            self.writer = create_file_sink(sink, out_dir, dbname, language, asset, threshold, on_commit, schema)
+            return
+
+        # Get collection from the connection shared by the process, with the write concern of the profile
+        self.database = get_database(dbname)
+        self.client = self.database.client
+        self.collection = self.database.get_collection(language)
+        self.writer = BulkWriter(self.collection, threshold, batch_bytes, ordered, writers, language, asset, raw_bson, on_commit)
+
     def check_and_add_index(self) -> None:
         # Check if collection already exists
         self.__check_collection_already_exists(self.force)
@@ -37,22 +71,45 @@ class Uploader:
         # Add unique index to collection for field "line"
         self.__add_unique_line_index()
 
+    def check_collection(self) -> None:
+        # Used in bulk-load mode, the index is built once the language is inserted
+        self.__check_collection_already_exists(self.force)
+
+    def add_index(self) -> None:
+        # Used when resuming, the collection already exists and the index is kept
+        self.__add_unique_line_index()
+
+    def add_deferred_index(self) -> int:
+        # Builds the index on the inserted profiles, returns the number of conflicting lines
+        if self.client is None:
+            return 0
+        try:
+            self.__add_unique_line_index()
+            return 0
+        except OperationFailure as err:
+            if err.code != DUPLICATE_KEY_ERROR:
+                raise err
+        conflicts = self.__find_line_conflicts()
+        reported = ', '.join(str(conflict['_id']) for conflict in conflicts[:MAX_REPORTED_CONFLICTS])
+        log.err(f'{len(conflicts)} lines are not unique, lineIndex not built. Some of them are {reported}',
+                lang=self.language)
+        return len(conflicts)
+
+    def collection_exists(self) -> bool:
+        return self.client is not None and self.collection.name in self.database.list_collection_names()
+
+    def delete_lines(self, first_line: int, last_line: int) -> int:
+        # Used by the incremental purge, removes the profiles of an asset that changed
+        result = self.collection.delete_many({'line': {'$gte': first_line, '$lte': last_line}})
+        return result.deleted_count
+
     def upload(self) -> None:
-        if self.buffer:
-            n_elements = len(self.buffer)
-            log.debug(f'Uploading {n_elements} elements',
-                      lang=self.language, asset=self.asset)
-            self.collection.insert_many(self.buffer)
-            self.buffer = []
-            log.debug(f'Uploaded {n_elements} elements',
-                      lang=self.language, asset=self.asset)
+        self.writer.flush()
 
     def append(self, person: dict[str, str]) -> None:
-        self.buffer.append(person)
-
-        if len(self.buffer) == self.threshold:
-            self.upload()
+        # the line of the last profile is the mark notified once the profile is committed
+        self.writer.append(person, person['line'])
 
     def destroy(self) -> None:
-        self.buffer = []
-        self.client.close()
+        # wait for the queued batches to be inserted, the connection stays open for the next assets
+        self.writer.close()
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Optional
+from joblib import Parallel, delayed
+
+from ..utils import logger as log
+from ..utils.codecs import PLAIN, SUFFIXES, COMPRESSED_SUFFIXES, check_codec, detect_codec, open_codec
+from ..purger.utils.filedir import FileDir
+from .utils.defaults import DEFAULT_SRC, DEFAULT_LANGS, DEFAULT_CODEC, DEFAULT_LEVEL, DEFAULT_PARALLEL, DEFAULT_PROCESSES, DEFAULT_WIDE, DEFAULT_KEEP, DEFAULT_FORCE
+
+# decompressed bytes copied at a time
+COPY_CHUNK = 2**20
+
+
+def _copy_counting(source, target=None) -> tuple[int, int, str]:
+    # returns the lines, the bytes and the hash of what was read, the last line can have no line break
+    lines, size, last = 0, 0, b'\n'
+    digest = hashlib.blake2b()
+    for chunk in iter(lambda: source.read(COPY_CHUNK), b''):
+        if target is not None:
+            target.write(chunk)
+        lines += chunk.count(b'\n')
+        size += len(chunk)
+        digest.update(chunk)
+        last = chunk[-1:]
+    return lines + (last != b'\n'), size, digest.hexdigest()
+
+
+def target_path(asset: Path, codec: str) -> Path:
+    # the codec suffix of the asset is replaced, a plain asset keeps its name plus the suffix
+    base = asset.name[:-len(asset.suffix)] if asset.suffix in COMPRESSED_SUFFIXES else asset.name
+    return asset.with_name(base if codec == PLAIN else base + SUFFIXES[codec])
+
+
+class Recompressor:
+
+    def __set_fields(self, langs: list[str], codec: str, level: Optional[int], parallel: bool, processes: int, wide: bool, keep: bool, force: bool):
+        self.langs = self.available_langs if 'all' in langs else langs
+        self.codec = codec
+        self.level = level
+        self.parallel = parallel
+        self.processes = processes
+        self.wide = wide
+        self.keep = keep
+        self.force = force
+
+    def __print_settings(self) -> None:
+        print('---------------')
+        print(f'Datasets dir is {self.src}')
+        print(f'Languages to recompress are {" ".join(self.langs)}')
+        print(f'Codec of the recompressed assets is {self.codec}')
+        print(f'Compression level is {self.level or "the default one of the codec"}')
+        print(f'Will I try to parallelize? {self.parallel}')
+        print(f'If I parallelize, I will use {self.processes} processes')
+        print(f'Will consider also txt files: {self.wide}')
+        print(f'Will I keep the original assets? {self.keep}')
+        print(f'Will I overwrite the already recompressed assets? {self.force}')
+        print('---------------')
+
+    def _recompress_asset(self, lang: str, asset: Path) -> Optional[dict]:
+        codec = detect_codec(asset)
+        target = target_path(asset, self.codec)
+        if codec == self.codec:
+            log.info('Skipping recompressing, asset already in the codec', lang=lang, asset=asset.name)
+            return None
+        if target.exists() and not self.force:
+            log.warn(f'Skipping recompressing, {target.name} already exists', lang=lang, asset=asset.name)
+            return None
+
+        log.info(f'Start recompressing asset from {codec} to {self.codec}', lang=lang, asset=asset.name)
+        start_time = time.time()
+        source_size = asset.stat().st_size
+        temp_path = target.with_name(target.name + '.tmp')
+        with open_codec(asset, 'rb', codec) as source, open_codec(temp_path, 'wb', self.codec, self.level) as output:
+            lines, size, digest = _copy_counting(source, output)
+        # the written asset is read again, it replaces the original only if it has the same content
+        with open_codec(temp_path, 'rb', self.codec) as written:
+            written_lines, written_size, written_digest = _copy_counting(written)
+        if (written_lines, written_size, written_digest) != (lines, size, digest):
+            temp_path.unlink()
+            txt = f'Recompressed asset has {written_lines} lines, {written_size} bytes and hash {written_digest} instead of {lines}, {size} and {digest}'
+            log.err(txt, lang=lang, asset=asset.name)
+            raise Exception(txt)
+        os.replace(temp_path, target)
+        # the purge would read both the assets
+        if not self.keep:
+            asset.unlink()
+
+        report = {
+            'lang': lang,
+            'asset': asset.name,
+            'target': target.name,
+            'lines': lines,
+            'bytes': size,
+            'source_size': source_size,
+            'target_size': target.stat().st_size,
+            'seconds': time.time() - start_time
+        }
+        log.succ(f'Finish recompressing asset, {lines} lines verified', lang=lang, asset=asset.name)
+        return report
+
+    def __init__(self, src=DEFAULT_SRC):
+        self.src = src
+        self.filedir = FileDir(Path(src))
+        self.available_langs = self.filedir.retrieve_langs()
+
+    def recompress(self, langs: list[str] = DEFAULT_LANGS, codec=DEFAULT_CODEC, level=DEFAULT_LEVEL, parallel=DEFAULT_PARALLEL, processes=DEFAULT_PROCESSES, wide=DEFAULT_WIDE, keep=DEFAULT_KEEP, force=DEFAULT_FORCE) -> list[dict]:
+        self.__set_fields(langs, codec, level, parallel, processes, wide, keep, force)
+        self.__print_settings()
+        check_codec(self.codec)
+        units = [
+            (lang, asset)
+            for lang in self.langs
+            for asset in self.filedir.retrieve_lang_assets(lang, self.wide)
+        ]
+        if self.parallel:
+            reports = Parallel(n_jobs=self.processes)(
+                delayed(self._recompress_asset)(lang, asset)
+                for lang, asset in units
+            )
+        else:
+            reports = [self._recompress_asset(lang, asset) for lang, asset in units]
+        reports = [report for report in reports if report is not None]
+
+        for lang in self.langs:
+            lang_reports = [report for report in reports if report['lang'] == lang]
+            log.info(f'{len(lang_reports)} assets recompressed, {sum(report["lines"] for report in lang_reports)} lines verified', lang=lang)
+        return reports
@@ -0,0 +1,11 @@
+import multiprocessing
+
+DEFAULT_SRC = 'datasets'
+DEFAULT_LANGS = ['all']
+DEFAULT_CODEC = 'xz'
+DEFAULT_LEVEL = None
+DEFAULT_PARALLEL = False
+DEFAULT_PROCESSES = multiprocessing.cpu_count()
+DEFAULT_WIDE = False
+DEFAULT_KEEP = True
+DEFAULT_FORCE = False
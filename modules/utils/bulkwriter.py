@@ -0,0 +1,157 @@
+import threading
+import time
+from queue import Queue
+from typing import Callable, Optional
+from bson import encode
+from bson.raw_bson import RawBSONDocument
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+
+from . import logger as log
+from . import metrics
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class BulkWriter:
+
+    def __commit(self, sequence: int, inserted: int, duplicates: int) -> None:
+        with self.lock:
+            self.inserted += inserted
+            self.duplicates += duplicates
+            # the commit mark advances only when all the previous batches are inserted too
+            self.completed.add(sequence)
+            mark = None
+            while self.next_commit in self.completed:
+                self.completed.remove(self.next_commit)
+                mark = self.marks.pop(self.next_commit)
+                self.next_commit += 1
+            if mark is not None and self.on_commit:
+                self.on_commit(mark)
+
+    def __insert(self, sequence: int, batch: list) -> None:
+        n_elements = len(batch)
+        log.debug(f'Uploading {n_elements} elements',
+                  lang=self.lang, asset=self.asset)
+        if self.encoded:
+            batch = [RawBSONDocument(raw) for raw in batch]
+        start = time.perf_counter()
+        try:
+            self.collection.insert_many(batch, ordered=self.ordered)
+            inserted, duplicates = n_elements, 0
+        except BulkWriteError as err:
+            # an unordered batch goes on after a duplicate, count them instead of failing
+            errors = err.details['writeErrors']
+            if self.ordered or any(error['code'] != DUPLICATE_KEY_ERROR for error in errors):
+                raise err
+            inserted, duplicates = err.details['nInserted'], len(errors)
+            log.warn(f'{duplicates} duplicated elements in a batch of {n_elements}',
+                     lang=self.lang, asset=self.asset)
+        metrics.add('seconds_insert', time.perf_counter() - start, self.lang)
+        metrics.add('profiles_uploaded', inserted, self.lang)
+        metrics.add('profiles_duplicated', duplicates, self.lang)
+        self.__commit(sequence, inserted, duplicates)
+        log.debug(f'Uploaded {inserted} elements',
+                  lang=self.lang, asset=self.asset)
+
+    def __write_queued_batches(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            # after an error the batches are only drained, so that the producer is not blocked
+            if self.writers_error is None:
+                try:
+                    self.__insert(*item)
+                except Exception as err:
+                    self.writers_error = err
+
+    def __check_writers_error(self) -> None:
+        if self.writers_error is not None:
+            log.err('Background upload failed',
+                    lang=self.lang, asset=self.asset)
+            raise self.writers_error
+
+    def __start_writers(self) -> None:
+        # at most one batch per writer waits in the queue, when it is full the producer waits
+        self.queue = Queue(maxsize=self.writers)
+        self.writers_error = None
+        self.threads = [
+            threading.Thread(target=self.__write_queued_batches, daemon=True)
+            for _ in range(self.writers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def __stop_writers(self) -> None:
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def __init__(self, collection: Collection, threshold: int, batch_bytes: int, ordered: bool, writers: int, lang: str, asset: Optional[str] = None, raw_bson: bool = False, on_commit: Optional[Callable] = None):
+        self.collection = collection
+        self.threshold = threshold
+        self.batch_bytes = batch_bytes
+        self.ordered = ordered
+        # a batch measured in bytes is buffered already encoded, so that each document is encoded once
+        self.encoded = raw_bson or batch_bytes > 0
+        self.lang = lang
+        self.asset = asset
+
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.buffer_mark = None
+        self.lock = threading.Lock()
+        self.inserted = 0
+        self.duplicates = 0
+
+        # marks of the flushed batches, passed to on_commit once they are all inserted
+        self.on_commit = on_commit
+        self.marks = {}
+        self.completed = set()
+        self.sequence = 0
+        self.next_commit = 0
+
+        # start background writers if inserts are pipelined
+        self.writers = writers
+        if self.writers:
+            self.__start_writers()
+
+    def append(self, document: dict, mark=None) -> None:
+        self.buffer_mark = mark
+        if self.encoded:
+            # only the encoded bytes are buffered, pymongo sends them as they are
+            raw = encode(document, codec_options=self.collection.codec_options)
+            self.buffer.append(raw)
+            self.buffer_bytes += len(raw)
+        else:
+            self.buffer.append(document)
+
+        if len(self.buffer) == self.threshold or (self.batch_bytes and self.buffer_bytes >= self.batch_bytes):
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            batch = self.buffer
+            self.buffer = []
+            self.buffer_bytes = 0
+            sequence = self.sequence
+            self.sequence += 1
+            self.marks[sequence] = self.buffer_mark
+            if self.writers:
+                self.__check_writers_error()
+                self.queue.put((sequence, batch))
+            else:
+                self.__insert(sequence, batch)
+
+    def close(self) -> None:
+        self.buffer = []
+        self.buffer_bytes = 0
+        # wait for the queued batches to be inserted
+        if self.writers:
+            self.__stop_writers()
+            self.__check_writers_error()
+        if self.duplicates:
+            log.warn(f'{self.duplicates} duplicated elements were not inserted',
+                     lang=self.lang, asset=self.asset)
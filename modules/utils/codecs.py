@@ -0,0 +1,48 @@
+import bz2
+import gzip
+import lzma
+from pathlib import Path
+from typing import IO, Optional, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PLAIN = 'plain'
+# first bytes of a file written by each codec, an asset is decoded according to them and not to its suffix
+MAGICS = {
+    'bz2': b'BZh',
+    'gzip': b'\x1f\x8b',
+    'xz': b'\xfd7zXZ\x00',
+    'zstd': b'\x28\xb5\x2f\xfd'
+}
+CODECS = [*MAGICS, PLAIN]
+SUFFIXES = {'bz2': '.bz2', 'gzip': '.gz', 'xz': '.xz', 'zstd': '.zst', PLAIN: '.txt'}
+COMPRESSED_SUFFIXES = [SUFFIXES[codec] for codec in MAGICS]
+
+
+def detect_codec(path: Path) -> str:
+    with open(path, 'rb') as asset:
+        head = asset.read(max(len(magic) for magic in MAGICS.values()))
+    return next((codec for codec, magic in MAGICS.items() if head.startswith(magic)), PLAIN)
+
+
+def check_codec(codec: str) -> None:
+    if codec == 'zstd' and zstandard is None:
+        raise Exception('The zstd codec requires zstandard, install it with pip install zstandard')
+
+
+def open_codec(file: Union[Path, IO], mode: str, codec: str, level: Optional[int] = None, encoding: Optional[str] = None, newline: Optional[str] = None) -> IO:
+    # the level is used only when writing, None is the default one of the codec
+    check_codec(codec)
+    options = {'encoding': encoding, 'newline': newline}
+    if codec == PLAIN:
+        return open(file, mode, **options)
+    if codec == 'bz2':
+        return bz2.open(file, mode, compresslevel=level or 9, **options)
+    if codec == 'gzip':
+        return gzip.open(file, mode, compresslevel=level or 6, **options)
+    if codec == 'xz':
+        return lzma.open(file, mode, preset=level if 'w' in mode else None, **options)
+    return zstandard.open(file, mode, cctx=zstandard.ZstdCompressor(level=level or 3), **options)
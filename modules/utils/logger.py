@@ -1,7 +1,51 @@
-from termcolor import colored
+import atexit
+import os
+import sys
+import threading
+import time
 from datetime import datetime
+from json import dumps
+from queue import Queue, Full
+from termcolor import colored
 from typing import Optional
 
+DEBUG, INFO, SUCC, WARN, ERROR = 10, 20, 25, 30, 40
+LEVELS = {'DEBUG': DEBUG, 'INFO': INFO, 'SUCC': SUCC, 'WARN': WARN, 'ERROR': ERROR}
+COLOURS = {'DEBUG': 'grey', 'INFO': 'blue', 'SUCC': 'green', 'WARN': 'yellow', 'ERROR': 'red'}
+# the configuration is read from the environment, so that the joblib workers inherit it
+LEVEL_VARIABLE = 'FBL_LOG_LEVEL'
+FORMAT_VARIABLE = 'FBL_LOG_FORMAT'
+RATE_VARIABLE = 'FBL_LOG_RATE'
+DEFAULT_LEVEL = 'INFO'
+DEFAULT_FORMAT = 'text'
+# warnings of the same lang, asset and call site printed in a window, the others are only counted
+DEFAULT_RATE = 10
+RATE_WINDOW = 60
+# records waiting to be printed, when full the new ones are dropped instead of blocking
+QUEUE_SIZE = 100000
+
+_level = LEVELS[os.environ.get(LEVEL_VARIABLE, DEFAULT_LEVEL).upper()]
+_json = os.environ.get(FORMAT_VARIABLE, DEFAULT_FORMAT) == 'json'
+_rate = int(os.environ.get(RATE_VARIABLE, DEFAULT_RATE))
+
+# reentrant, a suppressed count can be reported while holding it
+_lock = threading.RLock()
+_queue: Optional[Queue] = None
+_pid = None
+_dropped = 0
+# for each lang, asset and call site (file and line), the start of the window and the warnings printed and suppressed in it
+_windows = {}
+
+
+def configure(level: str = DEFAULT_LEVEL, fmt: str = DEFAULT_FORMAT, rate: int = DEFAULT_RATE) -> None:
+    global _level, _json, _rate
+    os.environ[LEVEL_VARIABLE] = level.upper()
+    os.environ[FORMAT_VARIABLE] = fmt
+    os.environ[RATE_VARIABLE] = str(rate)
+    _level = LEVELS[level.upper()]
+    _json = fmt == 'json'
+    _rate = rate
+
 
 def _log_scopes(lang: Optional[str] = None, asset: Optional[str] = None, scope: Optional[str] = None) -> str:
     lang_str = colored(f'{{{lang}}}', 'yellow') if lang else ''
@@ -10,29 +54,110 @@ def _log_scopes(lang: Optional[str] = None, asset: Optional[str] = None, scope:
     return ' '.join([txt for txt in [lang_str, asset_str, scope_str] if txt])
 
 
-def _log(*args: list[str], tag: str, colour: str, lang: Optional[str] = None, asset: Optional[str] = None, scope: Optional[str] = None) -> None:
-    timestamp = datetime.now().isoformat()
+def _format(record: tuple) -> str:
+    timestamp, tag, args, lang, asset, scope = record
+    timestamp = datetime.fromtimestamp(timestamp).isoformat()
+    if _json:
+        return dumps({'time': timestamp, 'level': tag, 'lang': lang, 'asset': asset, 'scope': scope, 'message': ' '.join(str(arg) for arg in args)})
     timestamp_str = colored(f'[{timestamp}]', 'cyan')
-    tag = colored(f'[{tag}]', colour, attrs=['bold'])
+    tag_str = colored(f'[{tag}]', COLOURS[tag], attrs=['bold'])
     text = _log_scopes(lang=lang, asset=asset, scope=scope)
-    print(f'{timestamp_str} {tag} {text}', *args)
+    return ' '.join([f'{timestamp_str} {tag_str} {text}', *(str(arg) for arg in args)])
+
+
+def _write_queued_records(queue: Queue) -> None:
+    while True:
+        record = queue.get()
+        try:
+            sys.stdout.write(_format(record) + '\n')
+            if queue.empty():
+                sys.stdout.flush()
+        except Exception:
+            pass
+        finally:
+            queue.task_done()
+
+
+def _get_queue() -> Queue:
+    # the records are formatted and printed by a thread of each process
+    global _queue, _pid
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                _queue = Queue(maxsize=QUEUE_SIZE)
+                threading.Thread(target=_write_queued_records, args=(_queue,), daemon=True).start()
+                atexit.register(flush)
+                _pid = os.getpid()
+    return _queue
+
+
+def _log(*args: list[str], tag: str, lang: Optional[str] = None, asset: Optional[str] = None, scope: Optional[str] = None) -> None:
+    global _dropped
+    try:
+        _get_queue().put_nowait((time.time(), tag, args, lang, asset, scope))
+    except Full:
+        _dropped += 1
+
+
+def _report_suppressed(key: tuple, window: list) -> None:
+    lang, asset = key[:2]
+    _log(f'{window[2]} similar warnings were suppressed', tag='WARN', lang=lang, asset=asset)
+    window[2] = 0
+
+
+def flush() -> None:
+    # prints the suppressed and dropped counts and waits for the queued records
+    global _dropped
+    if _pid != os.getpid():
+        return
+    with _lock:
+        for key, window in _windows.items():
+            if window[2]:
+                _report_suppressed(key, window)
+    if _dropped:
+        dropped = _dropped
+        _dropped = 0
+        _log(f'{dropped} log records were dropped, the output could not keep up', tag='WARN')
+    _queue.join()
 
 
 def info(*args: list[str], lang: Optional[str] = None, asset: Optional[str] = None, scope: Optional[str] = None) -> None:
-    _log(*args, lang=lang, asset=asset, scope=scope, tag='INFO', colour='blue')
+    if _level <= INFO:
+        _log(*args, lang=lang, asset=asset, scope=scope, tag='INFO')
 
 
 def succ(*args: list[str], lang: Optional[str] = None, asset: Optional[str] = None, scope: Optional[str] = None) -> None:
-    _log(*args, lang=lang, asset=asset, scope=scope, tag='SUCC', colour='green')
+    if _level <= SUCC:
+        _log(*args, lang=lang, asset=asset, scope=scope, tag='SUCC')
 
 
 def debug(*args: list[str], lang: Optional[str] = None, asset: Optional[str] = None, scope: Optional[str] = None) -> None:
-    _log(*args, lang=lang, asset=asset, scope=scope, tag='DEBUG', colour='grey')
+    if _level <= DEBUG:
+        _log(*args, lang=lang, asset=asset, scope=scope, tag='DEBUG')
 
 
 def warn(*args: list[str], lang: Optional[str] = None, asset: Optional[str] = None, scope: Optional[str] = None) -> None:
-    _log(*args, lang=lang, asset=asset, scope=scope, tag='WARN', colour='yellow')
+    if _level > WARN:
+        return
+    if _rate:
+        now = time.monotonic()
+        # only the repeated warnings of a same call site are limited, the others have their own budget
+        caller = sys._getframe(1)
+        key = (lang, asset, caller.f_code.co_filename, caller.f_lineno)
+        with _lock:
+            window = _windows.get(key)
+            if window is None or now - window[0] >= RATE_WINDOW:
+                if window is not None and window[2]:
+                    _report_suppressed(key, window)
+                window = _windows[key] = [now, 0, 0]
+            if window[1] >= _rate:
+                window[2] += 1
+                return
+            window[1] += 1
+    _log(*args, lang=lang, asset=asset, scope=scope, tag='WARN')
 
 
 def err(*args: list[str], lang: Optional[str] = None, asset: Optional[str] = None, scope: Optional[str] = None) -> None:
-    _log(*args, lang=lang, asset=asset, scope=scope, tag='ERROR', colour='red')
+    # an error is usually followed by an exception, it is printed before raising it
+    _log(*args, lang=lang, asset=asset, scope=scope, tag='ERROR')
+    flush()
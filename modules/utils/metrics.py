@@ -0,0 +1,192 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from json import dumps, loads
+from pathlib import Path
+from typing import Optional
+
+from . import logger as log
+
+# Counters and timers of the purge and of the postprocessing. Each process sums
+# its own values and periodically writes them on a file of the metrics dir, the
+# main process aggregates the files of all the joblib workers in a json file
+# and a Prometheus textfile, rewritten at each interval.
+
+WORKERS_DIR = 'workers'
+JSON_REPORT = 'metrics.json'
+PROMETHEUS_REPORT = 'metrics.prom'
+PROMETHEUS_PREFIX = 'fbl'
+
+_values = defaultdict(float)
+_lock = threading.Lock()
+_metrics_dir: Optional[Path] = None
+_interval = 0
+_pid = None
+
+
+def _lang_label(lang: Optional[str]) -> str:
+    # collections are named as <LANG>_<Country>, the metrics are labelled by lang only
+    return lang.split('_')[0] if lang else 'all'
+
+
+def _write_atomically(path: Path, text: str) -> None:
+    temp_path = path.with_name(path.name + '.tmp')
+    with open(temp_path, 'w') as temp_file:
+        temp_file.write(text)
+    os.replace(temp_path, path)
+
+
+def _flush_periodically() -> None:
+    while True:
+        time.sleep(_interval)
+        flush()
+
+
+def setup(metrics_dir: Optional[str], interval: float) -> None:
+    # called in every process that collects metrics, the values are flushed by a background thread
+    global _metrics_dir, _interval, _pid
+    if not metrics_dir:
+        return
+    _metrics_dir = Path(metrics_dir)
+    _metrics_dir.joinpath(WORKERS_DIR).mkdir(parents=True, exist_ok=True)
+    _interval = interval
+    if _pid != os.getpid():
+        _pid = os.getpid()
+        # a forked process does not inherit the values of its parent
+        _values.clear()
+        threading.Thread(target=_flush_periodically, daemon=True).start()
+
+
+def enabled() -> bool:
+    return _metrics_dir is not None
+
+
+def add(name: str, value: float, lang: Optional[str] = None) -> None:
+    if _metrics_dir is None:
+        return
+    with _lock:
+        _values[(name, _lang_label(lang))] += value
+
+
+def flush() -> None:
+    if _metrics_dir is None:
+        return
+    with _lock:
+        values = [[name, lang, value] for (name, lang), value in _values.items()]
+    _write_atomically(_metrics_dir.joinpath(WORKERS_DIR, f'{os.getpid()}.json'), dumps(values))
+
+
+def aggregate(metrics_dir: str) -> dict:
+    aggregated = defaultdict(lambda: defaultdict(float))
+    for worker_path in Path(metrics_dir).joinpath(WORKERS_DIR).glob('*.json'):
+        with open(worker_path) as worker_file:
+            for name, lang, value in loads(worker_file.read()):
+                aggregated[lang][name] += value
+    return {lang: dict(values) for lang, values in sorted(aggregated.items())}
+
+
+def _prometheus(aggregated: dict) -> str:
+    lines = []
+    names = sorted({name for values in aggregated.values() for name in values})
+    for name in names:
+        metric = f'{PROMETHEUS_PREFIX}_{name}_total'
+        lines.append(f'# TYPE {metric} counter')
+        for lang, values in aggregated.items():
+            if name in values:
+                lines.append(f'{metric}{{lang="{lang}"}} {values[name]}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_reports(metrics_dir: str, elapsed: float) -> dict:
+    aggregated = aggregate(metrics_dir)
+    _write_atomically(Path(metrics_dir).joinpath(JSON_REPORT), dumps({'elapsed': elapsed, 'langs': aggregated}, indent=4))
+    _write_atomically(Path(metrics_dir).joinpath(PROMETHEUS_REPORT), _prometheus(aggregated))
+    return aggregated
+
+
+# Accumulates the time spent in each stage of a loop and the counters of the
+# loop, pushing them to the metrics of the process about once per interval.
+class StageClock:
+
+    def __push(self, now: float) -> None:
+        for stage, seconds in self.seconds.items():
+            add(f'seconds_{stage}', seconds, self.lang)
+        for name, value in self.counters.items():
+            add(name, value, self.lang)
+        self.seconds = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.next_push = now + _interval
+
+    def __init__(self, lang: str):
+        self.lang = lang
+        self.enabled = enabled()
+        self.seconds = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.last = time.perf_counter()
+        self.next_push = self.last + _interval
+
+    def lap(self, stage: str) -> None:
+        # the time from the previous lap is spent in the given stage
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.seconds[stage] += now - self.last
+        self.last = now
+        if now >= self.next_push:
+            self.__push(now)
+
+    def count(self, name: str, value: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] += value
+
+    def close(self) -> None:
+        if self.enabled:
+            self.__push(time.perf_counter())
+            flush()
+
+
+# Runs in the main process, rewriting the reports at each interval and logging a summary at the end
+class Reporter:
+
+    def __report_periodically(self) -> None:
+        while not self.done.wait(self.interval):
+            flush()
+            write_reports(self.metrics_dir, time.time() - self.start_time)
+
+    def __init__(self, metrics_dir: Optional[str], interval: float):
+        self.metrics_dir = metrics_dir
+        self.interval = interval
+
+    def start(self) -> None:
+        if not self.metrics_dir:
+            return
+        # the files of the workers of a previous run are removed, as the values of this process
+        with _lock:
+            _values.clear()
+        workers_dir = Path(self.metrics_dir).joinpath(WORKERS_DIR)
+        if workers_dir.is_dir():
+            for worker_path in workers_dir.glob('*.json'):
+                worker_path.unlink()
+        setup(self.metrics_dir, self.interval)
+        self.start_time = time.time()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.__report_periodically, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        if not self.metrics_dir:
+            return
+        self.done.set()
+        self.thread.join()
+        flush()
+        elapsed = time.time() - self.start_time
+        aggregated = write_reports(self.metrics_dir, elapsed)
+        log.flush()
+        print('---------------')
+        print(f'Elapsed seconds: {elapsed:.1f}')
+        for lang, values in aggregated.items():
+            for name, value in sorted(values.items()):
+                print(f'{lang} {name}: {value:.0f}' if value.is_integer() else f'{lang} {name}: {value:.2f}')
+        print('---------------')
+        log.succ(f'Metrics written in {self.metrics_dir}', scope='Metrics')
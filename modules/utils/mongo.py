@@ -0,0 +1,56 @@
+import os
+from typing import Optional
+from pymongo import MongoClient
+from pymongo.database import Database
+from pymongo.write_concern import WriteConcern
+
+# the configuration is read from the environment, so that the joblib workers inherit it
+URI_VARIABLE = 'FBL_MONGO_URI'
+POOL_SIZE_VARIABLE = 'FBL_MONGO_POOL_SIZE'
+COMPRESSORS_VARIABLE = 'FBL_MONGO_COMPRESSORS'
+WRITE_CONCERN_VARIABLE = 'FBL_MONGO_WRITE_CONCERN'
+DEFAULT_URI = 'mongodb://localhost:27017'
+DEFAULT_POOL_SIZE = 100
+DEFAULT_COMPRESSORS = ''
+DEFAULT_WRITE_CONCERN = 'default'
+# fast acknowledges the inserts before they are journaled, safe waits for the majority and the journal
+WRITE_CONCERNS = {
+    'fast': WriteConcern(w=1, j=False),
+    'default': WriteConcern(),
+    'safe': WriteConcern(w='majority', j=True)
+}
+
+_client: Optional[MongoClient] = None
+_pid = None
+
+
+def configure(uri: str = DEFAULT_URI, pool_size: int = DEFAULT_POOL_SIZE, compressors: str = DEFAULT_COMPRESSORS, write_concern: str = DEFAULT_WRITE_CONCERN) -> None:
+    global _client, _pid
+    os.environ[URI_VARIABLE] = uri
+    os.environ[POOL_SIZE_VARIABLE] = str(pool_size)
+    os.environ[COMPRESSORS_VARIABLE] = compressors
+    os.environ[WRITE_CONCERN_VARIABLE] = write_concern
+    # the next client is opened with the new configuration
+    if _client is not None and _pid == os.getpid():
+        _client.close()
+    _client = None
+    _pid = None
+
+
+def get_client() -> MongoClient:
+    # a client per process, shared by all the assets and languages it works on
+    global _client, _pid
+    if _pid != os.getpid():
+        options = {'maxPoolSize': int(os.environ.get(POOL_SIZE_VARIABLE, DEFAULT_POOL_SIZE))}
+        compressors = os.environ.get(COMPRESSORS_VARIABLE, DEFAULT_COMPRESSORS)
+        if compressors:
+            options['compressors'] = compressors
+        # a client inherited by a forked process cannot be used, a new one is opened
+        _client = MongoClient(os.environ.get(URI_VARIABLE, DEFAULT_URI), **options)
+        _pid = os.getpid()
+    return _client
+
+
+def get_database(dbname: str) -> Database:
+    write_concern = os.environ.get(WRITE_CONCERN_VARIABLE, DEFAULT_WRITE_CONCERN)
+    return get_client().get_database(dbname, write_concern=WRITE_CONCERNS[write_concern])
@@ -0,0 +1,55 @@
+import os
+from json import dumps, loads
+from pathlib import Path
+from typing import Optional
+
+from .codecs import detect_codec
+
+# relative cost of a byte of each kind of asset against a plain one, bz2 decompression dominates
+CODEC_WEIGHTS = {'bz2': 4.0, 'xz': 3.0, 'gzip': 1.5, 'zstd': 1.2, 'plain': 1.0}
+
+
+def weighted_size(path: Path) -> float:
+    return path.stat().st_size * CODEC_WEIGHTS[detect_codec(path)]
+
+
+# Seconds taken by each work unit in the last run, saved as a json file per unit
+# since the units are run by different processes.
+class RunHistory:
+
+    def __path(self, names: tuple) -> Path:
+        return self.history_dir.joinpath(*names[:-1], f'{names[-1]}.history.json')
+
+    def __init__(self, history_dir: str):
+        self.history_dir = Path(history_dir)
+
+    def load(self, *names: str) -> Optional[dict]:
+        path = self.__path(names)
+        if not path.is_file():
+            return None
+        with open(path) as history_file:
+            return loads(history_file.read())
+
+    def record(self, size: float, seconds: float, *names: str) -> None:
+        path = self.__path(names)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(path.name + '.tmp')
+        with open(temp_path, 'w') as history_file:
+            history_file.write(dumps({'size': size, 'seconds': seconds}))
+        os.replace(temp_path, path)
+
+
+def estimate_costs(sizes: list[float], histories: list[Optional[dict]]) -> list[float]:
+    # the seconds of the last run, scaled if the size changed, or the size at the mean rate of the known units
+    known = [(size, history) for size, history in zip(sizes, histories) if history and history['size']]
+    known_size = sum(history['size'] for _, history in known)
+    rate = sum(history['seconds'] for _, history in known) / known_size if known_size else 1.0
+    return [
+        history['seconds'] * size / history['size'] if history and history['size'] else size * rate
+        for size, history in zip(sizes, histories)
+    ]
+
+
+def largest_first(units: list, costs: list[float]) -> list:
+    # dispatching the costliest units first leaves only short ones for the end of the run
+    return [unit for _, unit in sorted(zip(costs, units), key=lambda pair: pair[0], reverse=True)]